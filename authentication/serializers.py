@@ -19,6 +19,8 @@ class SignInSerializer(serializers.ModelSerializer):
         auth = authenticate(username=data["username"], password=data["password"])
         if auth is None:
             raise InvalidLogin({"message": "not valid auth"})
+        # the authenticated account, so the view doesn't read it again
+        data["user"] = auth
         return data
 
 
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authentication.models import Account
+from core.auth import account_cache
+
+
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+def forget_account(sender, instance, **kwargs):
+    # deactivating is a save too, the next request reads the account again
+    account_cache.delete(instance.pk)
@@ -1,6 +1,17 @@
+from unittest import mock
+
+from django.contrib.auth.signals import user_login_failed
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from authentication.models import Account
+from core.executors import BoundedExecutor, Overloaded
+
+
+class RejectAllBackend:
+    def authenticate(self, request, **credentials):
+        return None
 
 
 class SignInSerializerTestCase(APITestCase):
@@ -28,3 +39,96 @@ class SignInSerializerTestCase(APITestCase):
         self.assertNotIn("name", response.data)
         self.assertNotIn("id", response.data)
         self.assertNotIn("username", response.data)
+
+    def test_valid_login_reads_account_once(self):
+        url = reverse("authentication:signin")
+        data = {"username": self.username, "password": self.password}
+        with self.assertNumQueries(1):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncSignInTestCase(APITransactionTestCase):
+    # the password executor threads have their own connections, they only
+    # see what the test committed
+    serialized_rollback = True
+
+    def setUp(self):
+        self.username = "admin"
+        self.password = "admin!@#"
+        self.url = reverse("authentication:async_signin")
+
+    async def sign_in(self, password):
+        return await self.async_client.post(
+            self.url,
+            {"username": self.username, "password": password},
+            content_type="application/json",
+        )
+
+    async def test_valid_login(self):
+        response = await self.sign_in(self.password)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["username"], self.username)
+        self.assertIn("access", data["token"])
+
+        response = await self.async_client.get(
+            reverse("v1:async_vendors"),
+            headers={"Authorization": f"Bearer {data['token']['access']}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_invalid_login(self):
+        response = await self.sign_in("wrongpassword")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(response.json(), {"message": "not valid auth"})
+
+        response = await self.async_client.post(
+            self.url,
+            {"username": "nobody", "password": self.password},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        response = await self.async_client.post(
+            self.url, {"username": self.username}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", response.json())
+
+    async def test_login_goes_through_the_auth_backends(self):
+        failures = []
+
+        def receiver(sender, credentials, request, **kwargs):
+            failures.append((credentials["username"], request.path))
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        response = await self.sign_in("wrongpassword")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(failures, [(self.username, self.url)])
+
+        with self.settings(
+            AUTHENTICATION_BACKENDS=["authentication.tests.RejectAllBackend"]
+        ):
+            response = await self.sign_in(self.password)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_overloaded_login_is_refused(self):
+        with mock.patch.object(BoundedExecutor, "submit", side_effect=Overloaded):
+            response = await self.sign_in(self.password)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    async def test_outdated_hash_is_upgraded(self):
+        account = await Account.objects.aget(username=self.username)
+        with self.settings(
+            PASSWORD_HASHERS=[
+                "django.contrib.auth.hashers.MD5PasswordHasher",
+                "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            ]
+        ):
+            response = await self.sign_in(self.password)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await account.arefresh_from_db()
+        self.assertTrue(account.password.startswith("md5$"))
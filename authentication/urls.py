@@ -1,9 +1,10 @@
 from django.urls import path
 
-from authentication.views import SignInView
+from authentication.views import AsyncSignInView, SignInView
 
 app_name = "authentication"
 
 urlpatterns = [
     path("signin/", SignInView.as_view(), name="signin"),
+    path("async/signin/", AsyncSignInView.as_view(), name="async_signin"),
 ]
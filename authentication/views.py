@@ -1,9 +1,15 @@
+import json
+
+from django.http import JsonResponse
+from django.views import View
 from drf_yasg.utils import swagger_auto_schema
-from rest_framework import generics
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
-from authentication.models import Account
 from authentication.serializers import SignInResponseSerializer, SignInSerializer
+from core.auth import aauthenticate, account_cache
+from core.executors import Overloaded
 
 
 class SignInView(generics.GenericAPIView):
@@ -14,6 +20,51 @@ class SignInView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         signin_response_serializer = SignInResponseSerializer
-        username = serializer.data.get("username").lower()
-        user = Account.objects.get(username=username)
+        user = serializer.validated_data["user"]
+        # the token is about to be used, spare its first request the lookup
+        account_cache.set(user)
         return Response(signin_response_serializer(user).data)
+
+
+class AsyncSignInView(View):
+    """
+    SignInView for ASGI deployments, the password hash runs in a bounded
+    thread pool so a burst of sign-ins doesn't hold up other requests
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # token based like the DRF views, there is no session to forge
+        view.csrf_exempt = True
+        return view
+
+    async def post(self, request):
+        try:
+            if request.content_type == "application/json":
+                data = json.loads(request.body)
+            else:
+                data = request.POST
+            credentials = SignInSerializer().to_internal_value(data)
+        except ValueError:
+            return JsonResponse(
+                {"message": "Invalid JSON"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            user = await aauthenticate(request, **credentials)
+        except Overloaded:
+            return JsonResponse(
+                {"message": "Too many sign-ins, try again shortly"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+        if user is None:
+            return JsonResponse(
+                {"message": "not valid auth"},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+        account_cache.set(user)
+        return JsonResponse(SignInResponseSerializer(user).data)
@@ -1,6 +1,19 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import close_old_connections
 from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
 from core.exceptions import GenericException
+from core.executors import get_password_executor
 
 
 class isAuthenticated(permissions.IsAuthenticated):
@@ -17,3 +30,135 @@ class AllowAny(permissions.AllowAny):
 
     def has_permission(self, request, view):
         return True
+
+
+def _authenticate(request, **credentials):
+    try:
+        return authenticate(request, **credentials)
+    finally:
+        # the executor threads outlive the request, like the request
+        # threads they drop a connection that is broken or too old
+        close_old_connections()
+
+
+async def aauthenticate(request=None, **credentials):
+    """
+    authenticate() for async views, run in the password executor off the
+    event loop with the AUTHENTICATION_BACKENDS and the user_login_failed
+    signal. Raises Overloaded when too many sign-ins are already waiting
+    for it.
+    """
+    return await get_password_executor().run(_authenticate, request, **credentials)
+
+
+class AccountCache:
+    """
+    Active accounts of this process by id, the least recently used one is
+    dropped first. Saving or deleting an account only drops it here, the
+    other processes keep theirs until ACCOUNT_CACHE_TIMEOUT expires it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accounts = OrderedDict()
+
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._accounts.get(key)
+            if entry is None:
+                return None
+            expires, account = entry
+            if expires <= time.monotonic():
+                del self._accounts[key]
+                return None
+            self._accounts.move_to_end(key)
+        # requests may change their user, never the cached one
+        return copy.copy(account)
+
+    def set(self, account):
+        if not settings.ACCOUNT_CACHE_TIMEOUT or not account.is_active:
+            return
+        key = str(account.pk)
+        expires = time.monotonic() + settings.ACCOUNT_CACHE_TIMEOUT
+        with self._lock:
+            self._accounts[key] = (expires, copy.copy(account))
+            self._accounts.move_to_end(key)
+            while len(self._accounts) > settings.ACCOUNT_CACHE_SIZE:
+                self._accounts.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._accounts.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._accounts.clear()
+
+
+account_cache = AccountCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication reading the token's account from account_cache, only
+    a miss queries the database
+    """
+
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            account_cache.set(user)
+        return user
+
+    def get_cached_user(self, validated_token):
+        user = account_cache.get(validated_token.get(api_settings.USER_ID_CLAIM))
+        if user is None:
+            return None
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                "The user's password has been changed.", code="password_changed"
+            )
+        return user
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWTAuthentication for plain Django async views, the user is read with
+    the async ORM
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is not None:
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        account_cache.set(user)
+        return user
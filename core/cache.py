@@ -0,0 +1,147 @@
+import threading
+import time
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from core.routers import use_primary
+
+# callers in one process missing the same key wait on the same lock
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _get_local_lock(key):
+    return _locks[zlib.crc32(key.encode()) % len(_locks)]
+
+
+def get_or_set_single_flight(key, fetch, timeout=None, lock_timeout=5, wait=0.05):
+    """
+    cache.get_or_set where only one caller runs fetch on a miss: threads
+    of this process queue on a local lock, other processes see the lease
+    added to the cache and poll for the value instead of fetching too
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    with _get_local_lock(key):
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                # a replica may still hold what the invalidation replaced
+                with use_primary():
+                    value = fetch()
+                cache.set(key, value, timeout)
+            finally:
+                cache.delete(lock_key)
+            return value
+
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(wait)
+            value = cache.get(key)
+            if value is not None:
+                return value
+        # the other fetch died or is too slow, don't wait any longer
+        with use_primary():
+            return fetch()
+
+
+def _get_generation_cache():
+    # apart from the payloads, so culling them never drops a generation
+    return caches[settings.GENERATION_CACHE]
+
+
+def get_vendor_performance_generation_key(vendor_id):
+    return f"vendor_performance:{vendor_id}:generation"
+
+
+def get_vendor_performance_key(vendor_id, generation):
+    return f"vendor_performance:{vendor_id}:{generation}"
+
+
+def get_vendor_performance_generation(vendor_id):
+    """
+    Part of the cached performance key of the vendor, read before the
+    fetch: a fetch that read the row before an invalidation caches it
+    under a generation nobody reads anymore
+    """
+    generations = _get_generation_cache()
+    key = get_vendor_performance_generation_key(vendor_id)
+    generation = generations.get(key)
+    if generation is None:
+        # evicted or never set, start past every generation used before
+        generations.add(key, time.time_ns(), None)
+        generation = generations.get(key)
+    return generation
+
+
+def get_vendor_performance(vendor_id, fetch):
+    generation = get_vendor_performance_generation(vendor_id)
+    return get_or_set_single_flight(
+        get_vendor_performance_key(vendor_id, generation),
+        fetch,
+        timeout=settings.VENDOR_PERFORMANCE_CACHE_TIMEOUT,
+    )
+
+
+async def aget_vendor_performance(vendor_id, fetch):
+    """
+    get_vendor_performance for async views, only a miss needs a thread
+    """
+    generation = await _get_generation_cache().aget(
+        get_vendor_performance_generation_key(vendor_id)
+    )
+    if generation is not None:
+        value = await cache.aget(get_vendor_performance_key(vendor_id, generation))
+        if value is not None:
+            return value
+    return await sync_to_async(get_vendor_performance)(vendor_id, fetch)
+
+
+LEADERBOARD_VERSION_KEY = "vendor_leaderboard:version"
+
+
+def get_vendor_leaderboard_version():
+    """
+    Part of every cached leaderboard key, bumping it orphans all of them
+    whatever weights they were computed with
+    """
+    generations = _get_generation_cache()
+    version = generations.get(LEADERBOARD_VERSION_KEY)
+    if version is None:
+        # like a vendor generation, past every version used before
+        generations.add(LEADERBOARD_VERSION_KEY, time.time_ns(), None)
+        version = generations.get(LEADERBOARD_VERSION_KEY)
+    return version
+
+
+def _invalidate(vendor_ids):
+    generations = _get_generation_cache()
+    for vendor_id in vendor_ids:
+        try:
+            generations.incr(get_vendor_performance_generation_key(vendor_id))
+        except ValueError:
+            # no generation, the next read starts a new one
+            pass
+    try:
+        generations.incr(LEADERBOARD_VERSION_KEY)
+    except ValueError:
+        pass
+
+
+def invalidate_vendor_performance(vendor_ids):
+    """
+    Move the cached performance of the vendors, and the cached leaderboards
+    ranking them, to a new generation once the change is committed. A miss
+    that read the old row before the commit caches it under the old one.
+    """
+    vendor_ids = list(vendor_ids)
+    transaction.on_commit(lambda: _invalidate(vendor_ids))
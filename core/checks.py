@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# backends whose entries only the process that wrote them can read
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register()
+def check_replica_pin_cache(app_configs, **kwargs):
+    """
+    With replicas, the pin set by the process that served a write has to
+    reach the process serving the next read of that user
+    """
+    if not settings.DATABASE_REPLICAS:
+        return []
+    alias = settings.REPLICA_PIN_CACHE
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend is not None and backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            f"REPLICA_PIN_CACHE {alias!r} is not a cache shared by the processes",
+            hint="Point it at a database, memcached or redis cache, otherwise "
+            "users may not read their own writes from the replicas",
+            id="core.E001",
+        )
+    ]
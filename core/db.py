@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_query_observers = ContextVar("query_observers", default=())
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Call observer(seconds) after every query run in this context, including
+    the ones async views run through sync_to_async in another thread
+    """
+    token = _query_observers.set((*_query_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _query_observers.reset(token)
+
+
+def _notify_observers(execute, sql, params, many, context):
+    observers = _query_observers.get()
+    if not observers:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        for observer in observers:
+            observer(seconds)
+
+
+@receiver(connection_created)
+def install_query_observers(sender, connection, **kwargs):
+    # connections are per thread, so this is the one place that sees them all
+    if _notify_observers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_notify_observers)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Run SQLITE_PRAGMAS on every new SQLite connection, the only way to
+    set them before Django's backend accepts an init command
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
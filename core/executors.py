@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor that raises Overloaded once max_pending calls are
+    running or waiting, instead of queueing them without limit
+    """
+
+    def __init__(self, max_workers, max_pending, name=""):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=name)
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, func, *args, **kwargs):
+        if not self._pending.acquire(blocking=False):
+            raise Overloaded
+
+        def call():
+            # free the slot before the caller sees the result
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._pending.release()
+
+        try:
+            return self._executor.submit(call)
+        except BaseException:
+            self._pending.release()
+            raise
+
+    async def run(self, func, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+
+_password_executor = None
+_lock = threading.Lock()
+
+
+def get_password_executor():
+    """
+    The executor of this process for password hashes, slow on purpose and
+    too slow for the event loop
+    """
+    global _password_executor
+    with _lock:
+        if _password_executor is None:
+            _password_executor = BoundedExecutor(
+                settings.PASSWORD_HASHING_WORKERS,
+                settings.PASSWORD_HASHING_MAX_PENDING,
+                name="password-hashing",
+            )
+    return _password_executor
@@ -0,0 +1,132 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+from core.exceptions import PuclicException
+
+
+def _parse(value):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def get_fieldset_key(query_params):
+    """
+    ?fields= and ?exclude= in a canonical form, whatever the order or the
+    spacing of the names, "" when neither is given
+    """
+    fields = _parse(query_params.get("fields", ""))
+    exclude = _parse(query_params.get("exclude", ""))
+    if not fields and not exclude:
+        return ""
+    return f"fields={','.join(sorted(fields))};exclude={','.join(sorted(exclude))}"
+
+
+def _split(names):
+    """
+    "fk_vendor.name" -> ({}, {"fk_vendor": {"name"}}), "id" -> ({"id"}, {})
+    """
+    own, nested = set(), {}
+    for name in names:
+        head, _, rest = name.partition(".")
+        if rest:
+            nested.setdefault(head, set()).add(rest)
+        else:
+            own.add(head)
+    return own, nested
+
+
+def _select(serializer, fields, exclude, path=""):
+    """
+    {name: selection of the nested serializer or None} of the fields kept
+    """
+    own, nested = _split(fields) if fields is not None else (None, {})
+    excluded, excluded_nested = _split(exclude)
+    for name in sorted((own or set()) | set(nested) | excluded | set(excluded_nested)):
+        field = serializer.fields.get(name)
+        is_nested = name in nested or name in excluded_nested
+        if field is None or (
+            is_nested and not isinstance(field, serializers.Serializer)
+        ):
+            raise PuclicException({"message": f"Unknown field: {path}{name}"})
+
+    selection = {}
+    for name, field in serializer.fields.items():
+        if name in excluded or (
+            own is not None and name not in own and name not in nested
+        ):
+            continue
+        if not isinstance(field, serializers.Serializer):
+            selection[name] = None
+            continue
+        # "fk_vendor" asks for all of it, "fk_vendor.name" for some of it
+        nested_fields = None if own is None or name in own else nested[name]
+        selection[name] = _select(
+            field, nested_fields, excluded_nested.get(name, set()), f"{path}{name}."
+        )
+    return selection
+
+
+def _get_columns(serializer, selection, prefix=""):
+    """
+    Model fields behind the selection for QuerySet.only(), None when a
+    field isn't backed by a column of its own
+    """
+    model = serializer.Meta.model
+    columns = []
+    for name, nested in selection.items():
+        field = serializer.fields[name]
+        try:
+            model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        columns.append(prefix + field.source)
+        if nested is not None:
+            nested_columns = _get_columns(field, nested, f"{prefix}{field.source}__")
+            if nested_columns is None:
+                return None
+            columns += nested_columns
+    return columns
+
+
+class SparseFieldset:
+    """
+    The fields of serializer_class a request asked for with ?fields= and
+    ?exclude=, comma separated names where "fk_vendor.name" reaches into
+    a nested serializer. Only their columns are read from the database.
+    """
+
+    def __init__(self, serializer_class, query_params):
+        fields = _parse(query_params.get("fields", "")) or None
+        exclude = _parse(query_params.get("exclude", ""))
+        self.requested = fields is not None or bool(exclude)
+        self.serializer = serializer_class()
+        self.selection = _select(self.serializer, fields, exclude)
+
+    def get_queryset(self, queryset):
+        if not self.requested:
+            return queryset
+        columns = _get_columns(self.serializer, self.selection)
+        if columns is None:
+            return queryset
+        # select_related of a relation left out would fail with only()
+        related = [
+            column
+            for column in columns
+            if isinstance(self.serializer.fields.get(column), serializers.Serializer)
+        ]
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+    def trim(self, serializer):
+        if self.requested:
+            _trim(getattr(serializer, "child", serializer), self.selection)
+        return serializer
+
+
+def _trim(serializer, selection):
+    for name in list(serializer.fields):
+        if name not in selection:
+            serializer.fields.pop(name)
+        elif selection[name] is not None:
+            _trim(serializer.fields[name], selection[name])
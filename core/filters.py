@@ -0,0 +1,37 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import PurchaseStatus
+
+# date columns the purchase order list filters by range
+PURCHASE_ORDER_DATE_FILTERS = ("order_date", "delivery_date", "completed_date")
+
+
+def get_overdue_filter(now=None):
+    """
+    Pending orders whose delivery date has passed
+    """
+    return Q(status=PurchaseStatus.pending, delivery_date__lt=now or timezone.now())
+
+
+def filter_purchase_orders(
+    queryset, fk_vendor=None, status=None, overdue=None, **ranges
+):
+    """
+    Purchase orders of queryset matching every filter given: the vendor,
+    the status, overdue or not, and `<date>_after` (inclusive) /
+    `<date>_before` (exclusive) bounds of PURCHASE_ORDER_DATE_FILTERS
+    """
+    if fk_vendor is not None:
+        queryset = queryset.filter(fk_vendor_id=fk_vendor)
+    if status is not None:
+        queryset = queryset.filter(status=status)
+    if overdue is not None:
+        overdue_filter = get_overdue_filter()
+        queryset = queryset.filter(overdue_filter if overdue else ~overdue_filter)
+    for name in PURCHASE_ORDER_DATE_FILTERS:
+        if ranges.get(f"{name}_after") is not None:
+            queryset = queryset.filter(**{f"{name}__gte": ranges[f"{name}_after"]})
+        if ranges.get(f"{name}_before") is not None:
+            queryset = queryset.filter(**{f"{name}__lt": ranges[f"{name}_before"]})
+    return queryset
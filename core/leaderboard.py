@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When, Window
+from django.db.models.functions import Coalesce, PercentRank, Rank
+
+from core.cache import get_or_set_single_flight, get_vendor_leaderboard_version
+from core.models import Vendors
+
+# KPI -> (counter that has to be non zero for the KPI to mean anything,
+# whether a higher value is better)
+LEADERBOARD_KPIS = {
+    "on_time_delivery_rate": ("completed_po_count", True),
+    "quality_rating_avg": ("rated_po_count", True),
+    "average_response_time": ("acknowledged_po_count", False),
+    "fulfillment_rate": ("completed_po_count", True),
+}
+
+
+def _get_kpi(kpi):
+    counter, _ = LEADERBOARD_KPIS[kpi]
+    return Case(
+        When(**{counter: 0}, then=Value(None)),
+        default=F(kpi),
+        output_field=FloatField(),
+    )
+
+
+def _get_kpi_order(kpi, best_first=True):
+    _, higher_is_better = LEADERBOARD_KPIS[kpi]
+    value = _get_kpi(kpi)
+    # vendors without data come after the worst one either way
+    nulls = {"nulls_last": True} if best_first else {"nulls_first": True}
+    if higher_is_better == best_first:
+        return value.desc(**nulls)
+    return value.asc(**nulls)
+
+
+def _get_kpi_score(kpi):
+    """
+    The KPI mapped to 0..1, vendors without data for it score 0
+    """
+    value = _get_kpi(kpi)
+    if kpi == "quality_rating_avg":
+        score = value / 5.0
+    elif kpi == "average_response_time":
+        hours = settings.VENDOR_LEADERBOARD_RESPONSE_HOURS
+        score = hours / (value + hours)
+    else:
+        score = value / 100.0
+    return Coalesce(score, 0.0, output_field=FloatField())
+
+
+def get_composite_score(weights):
+    total = sum(weights.values())
+    return sum(
+        _get_kpi_score(kpi) * (100.0 * weight / total)
+        for kpi, weight in weights.items()
+        if weight
+    )
+
+
+def get_leaderboard_queryset(weights, sort="composite"):
+    """
+    Every vendor with its rank and percentile for each KPI and the weighted
+    composite score, all computed by window functions in one query
+    """
+    annotations = {"composite_score": get_composite_score(weights)}
+    for kpi in LEADERBOARD_KPIS:
+        annotations[f"{kpi}_rank"] = Window(Rank(), order_by=_get_kpi_order(kpi))
+        # share of the vendors doing worse, 100 for the best one
+        annotations[f"{kpi}_percentile"] = 100.0 * Window(
+            PercentRank(), order_by=_get_kpi_order(kpi, best_first=False)
+        )
+    composite_order = F("composite_score").desc()
+    annotations["composite_rank"] = Window(Rank(), order_by=composite_order)
+    annotations["composite_percentile"] = 100.0 * Window(
+        PercentRank(), order_by=F("composite_score").asc()
+    )
+
+    return (
+        Vendors.objects.annotate(**annotations)
+        .order_by(f"{sort}_rank", "id")
+        .values("id", "name", "vendor_code", *LEADERBOARD_KPIS, *annotations)
+    )
+
+
+def get_vendor_leaderboard(weights, sort="composite"):
+    """
+    The leaderboard queryset, or the whole ranking materialized in the
+    cache when VENDOR_LEADERBOARD_CACHE_TIMEOUT is set
+    """
+    queryset = get_leaderboard_queryset(weights, sort)
+    timeout = settings.VENDOR_LEADERBOARD_CACHE_TIMEOUT
+    if not timeout:
+        return queryset
+
+    weights_key = ",".join(f"{kpi}:{weights[kpi]:g}" for kpi in sorted(weights))
+    key = f"vendor_leaderboard:{get_vendor_leaderboard_version()}:{sort}:{weights_key}"
+    return get_or_set_single_flight(key, lambda: list(queryset), timeout=timeout)
@@ -0,0 +1,224 @@
+import json
+import math
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import PurchaseOrder, PurchaseStatus, Vendors
+from core.seeds.synthetic import SyntheticDataset
+from core.utils import (
+    METRIC_CALCULATORS,
+    apply_purchase_order_transition,
+    calculate_average_response_time,
+    calculate_on_time_delivery_rate,
+    calculate_quality_rating_avg,
+    recalculate_vendors_metrics,
+)
+from v1.serializers import (
+    PurchaseOrderCreateSerializer,
+    PurchaseOrderListSerializer,
+    VendorListSerializer,
+    VendorPerformanceSerializer,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(samples, percent):
+    """
+    Nearest-rank percentile of sorted samples
+    """
+    rank = max(math.ceil(percent / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def _measure(func, iterations):
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        queries += len(captured)
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "ops_per_second": round(iterations / total, 2) if total else None,
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "queries_per_op": round(queries / iterations, 2),
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Benchmarks whose p95 got slower than the baseline by more than
+    tolerance, or that run more queries than it did
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']}ms, baseline {expected['p95_ms']}ms"
+            )
+        if result["queries_per_op"] > expected["queries_per_op"]:
+            regressions.append(
+                f"{name}: {result['queries_per_op']} queries per op, "
+                f"baseline {expected['queries_per_op']}"
+            )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed vendors and purchase orders in a rolled back transaction and "
+        "time the metric engine, PO number allocation and serializers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendors", type=int, default=50)
+        parser.add_argument(
+            "--pos", type=int, default=5000, help="purchase orders over all vendors"
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument(
+            "--page-size", type=int, default=100, help="rows per list serializer"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the JSON report to this file")
+        parser.add_argument(
+            "--baseline", help="JSON report to compare against, fails on regressions"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="allowed p95 slowdown against the baseline, 0.2 is 20%%",
+        )
+
+    def handle(self, *args, **options):
+        if options["vendors"] < 1 or options["iterations"] < 1:
+            raise CommandError("--vendors and --iterations must be at least 1")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                vendors = self.seed(options["vendors"], options["pos"], options["seed"])
+                results = self.run_benchmarks(vendors, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+        report = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report)
+        self.stdout.write(report)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = compare_with_baseline(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("regressions:\n" + "\n".join(regressions))
+
+    def seed(self, vendor_count, po_count, seed):
+        dataset = SyntheticDataset(vendor_count, po_count, seed=seed, prefix="BENCH")
+        return dataset.write()
+
+    def run_benchmarks(self, vendors, options):
+        iterations = options["iterations"]
+        page_size = options["page_size"]
+        rng = random.Random(options["seed"])
+        results = {}
+
+        for calculate in (
+            calculate_on_time_delivery_rate,
+            calculate_quality_rating_avg,
+            calculate_average_response_time,
+        ):
+            results[calculate.__name__] = _measure(
+                lambda: calculate(rng.choice(vendors)), iterations
+            )
+
+        # the write path of the metric engine: counters, recalculation and
+        # history snapshot of a purchase order completing, and the bulk
+        # recalculation of the metrics worker
+        states = [
+            po.get_metric_state()
+            for po in PurchaseOrder.objects.filter(fk_vendor__in=vendors)[:page_size]
+        ]
+
+        def complete_purchase_order():
+            old_state = {**rng.choice(states), "status": PurchaseStatus.pending}
+            new_state = {
+                **old_state,
+                "status": PurchaseStatus.completed,
+                "completed_date": timezone.now(),
+            }
+            apply_purchase_order_transition(old_state, new_state)
+
+        results["purchase_order_transition"] = _measure(
+            complete_purchase_order, iterations
+        )
+
+        dirty = [(vendor.id, list(METRIC_CALCULATORS)) for vendor in vendors]
+        results["recalculate_vendors_metrics"] = _measure(
+            lambda: recalculate_vendors_metrics(dirty[:page_size]), iterations
+        )
+
+        delivery_date = timezone.now() + timedelta(days=10)
+
+        def create_purchase_order():
+            serializer = PurchaseOrderCreateSerializer(
+                data={
+                    "fk_vendor": rng.choice(vendors).id,
+                    "delivery_date": delivery_date,
+                    "items": {"item": "Item"},
+                    "quantity": 1,
+                }
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        results["purchase_order_create"] = _measure(create_purchase_order, iterations)
+
+        vendor_page = Vendors.objects.all()[:page_size]
+        po_page = PurchaseOrder.objects.select_related("fk_vendor")[:page_size]
+        for name, serializer_class, queryset in (
+            ("vendor_list", VendorListSerializer, vendor_page),
+            ("vendor_performance_list", VendorPerformanceSerializer, vendor_page),
+            ("purchase_order_list", PurchaseOrderListSerializer, po_page),
+        ):
+            results[name] = _measure(
+                lambda: serializer_class(queryset.all(), many=True).data, iterations
+            )
+
+        for name, serializer_class, queryset in (
+            ("vendor_detail", VendorPerformanceSerializer, Vendors.objects.all()),
+            (
+                "purchase_order_detail",
+                PurchaseOrderListSerializer,
+                PurchaseOrder.objects.select_related("fk_vendor"),
+            ),
+        ):
+            ids = list(queryset.values_list("id", flat=True)[:page_size])
+            results[name] = _measure(
+                lambda: serializer_class(queryset.get(id=rng.choice(ids))).data,
+                iterations,
+            )
+        return results
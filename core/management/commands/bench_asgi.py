@@ -0,0 +1,184 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.management.commands.bench import percentile
+from core.models import PurchaseOrder, Vendors
+from core.seeds.synthetic import SyntheticDataset
+from vms.asgi import application
+
+# endpoint -> (sync url name, async url name, url kwarg)
+ENDPOINTS = {
+    "vendor_list": ("vendors", "async_vendors", None),
+    "vendor_detail": ("vendors_detail", "async_vendors_detail", "vendor_id"),
+    "purchase_order_list": ("po", "async_po", None),
+    "purchase_order_detail": ("po_detail", "async_po_detail", "po_id"),
+    "vendor_performance": (
+        "vendors_performance",
+        "async_vendors_performance",
+        "vendor_id",
+    ),
+    "vendor_performance_history": (
+        "vendors_performance_history",
+        "async_vendors_performance_history",
+        "vendor_id",
+    ),
+}
+
+
+async def request(application, url, headers):
+    """
+    GET url from the ASGI application the way a server would, return the
+    response status
+    """
+    parts = urlsplit(url)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": parts.path,
+        "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    received = False
+    response = {}
+
+    async def receive():
+        nonlocal received
+        if received:
+            # nothing else is coming, the client stays connected
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await application(scope, receive, send)
+    return response.get("status")
+
+
+async def run_connections(application, urls, headers, connections, requests):
+    """
+    Share `requests` requests over `connections` clients sending one
+    request at a time each
+    """
+    timings = []
+    errors = 0
+    remaining = requests
+
+    async def connection():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            status = await request(application, next(urls), headers)
+            timings.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    return timings, errors, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync and async read endpoints under concurrent "
+        "connections, sending requests to the project's ASGI application "
+        "in process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=32)
+        parser.add_argument(
+            "--requests", type=int, default=500, help="per endpoint and path"
+        )
+        parser.add_argument("--vendors", type=int, default=50)
+        parser.add_argument("--pos", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--endpoint",
+            action="append",
+            choices=sorted(ENDPOINTS),
+            help="benchmark only this endpoint, can be repeated",
+        )
+
+    def handle(self, *args, **options):
+        if options["connections"] < 1 or options["requests"] < 1:
+            raise CommandError("--connections and --requests must be at least 1")
+        dataset = SyntheticDataset(
+            options["vendors"], options["pos"], seed=options["seed"], prefix="BENCHASGI"
+        )
+        if dataset.exists():
+            raise CommandError("a previous bench_asgi run left its vendors behind")
+
+        user = get_user_model().objects.create_user(
+            username=f"bench-asgi-{options['seed']}", password=None
+        )
+        vendor_ids = []
+        try:
+            vendor_ids = [vendor.id for vendor in dataset.write()]
+            po_ids = list(
+                PurchaseOrder.objects.filter(fk_vendor_id__in=vendor_ids).values_list(
+                    "id", flat=True
+                )
+            )
+            token = AccessToken.for_user(user)
+            headers = [(b"authorization", f"Bearer {token}".encode())]
+            report = async_to_sync(self.run)(vendor_ids, po_ids, headers, options)
+        finally:
+            Vendors.objects.filter(id__in=vendor_ids).delete()
+            user.delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def run(self, vendor_ids, po_ids, headers, options):
+        rng = random.Random(options["seed"])
+        ids = {"vendor_id": vendor_ids, "po_id": po_ids}
+        report = {
+            "profile": settings.DATABASE_PROFILE,
+            "connections": options["connections"],
+            "requests": options["requests"],
+        }
+
+        for endpoint in options["endpoint"] or ENDPOINTS:
+            *url_names, kwarg = ENDPOINTS[endpoint]
+            report[endpoint] = {}
+            for path, url_name in zip(("sync", "async"), url_names):
+
+                def urls():
+                    while True:
+                        kwargs = {kwarg: rng.choice(ids[kwarg])} if kwarg else {}
+                        yield reverse(f"v1:{url_name}", kwargs=kwargs)
+
+                timings, errors, elapsed = await run_connections(
+                    application,
+                    urls(),
+                    headers,
+                    options["connections"],
+                    options["requests"],
+                )
+                timings.sort()
+                report[endpoint][path] = {
+                    "requests_per_second": round(len(timings) / elapsed, 2),
+                    "p50_ms": round(percentile(timings, 50) * 1000, 3),
+                    "p95_ms": round(percentile(timings, 95) * 1000, 3),
+                    "errors": errors,
+                }
+        return report
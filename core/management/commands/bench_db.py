@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from multiprocessing import Pool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from core.management.commands.bench import percentile
+from core.models import PurchaseOrder, Vendors
+from core.seeds.synthetic import SyntheticDataset
+
+
+def run_worker(args):
+    """
+    Mix reads and purchase order updates until the deadline, counting
+    the writes SQLite refused with "database is locked"
+    """
+    vendor_ids, po_ids, deadline, write_ratio, seed = args
+    rng = random.Random(seed)
+    timings = {"read": [], "write": []}
+    locked = 0
+    while time.time() < deadline:
+        write = rng.random() < write_ratio
+        start = time.perf_counter()
+        try:
+            if write:
+                po = PurchaseOrder.objects.get(id=rng.choice(po_ids))
+                po.quality_rating = rng.randint(1, 5)
+                po.save(update_fields=["quality_rating", "updated_at"])
+            else:
+                list(
+                    PurchaseOrder.objects.select_related("fk_vendor").filter(
+                        fk_vendor_id=rng.choice(vendor_ids)
+                    )[:50]
+                )
+        except OperationalError:
+            locked += 1
+            continue
+        timings["write" if write else "read"].append(time.perf_counter() - start)
+    connection.close()
+    return timings, locked
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure read/write throughput of concurrent workers against the "
+        "configured database, run it once per VMS_DATABASE_PROFILE to compare"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+        parser.add_argument(
+            "--write-ratio", type=float, default=0.2, help="share of writes, 0 to 1"
+        )
+        parser.add_argument("--vendors", type=int, default=100)
+        parser.add_argument("--pos", type=int, default=20000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+        dataset = SyntheticDataset(
+            options["vendors"], options["pos"], seed=options["seed"], prefix="BENCHDB"
+        )
+        if dataset.exists():
+            raise CommandError("a previous bench_db run left its vendors behind")
+
+        vendors = dataset.write()
+        vendor_ids = [vendor.id for vendor in vendors]
+        try:
+            po_ids = list(
+                PurchaseOrder.objects.filter(fk_vendor_id__in=vendor_ids).values_list(
+                    "id", flat=True
+                )
+            )
+            report = self.run(vendor_ids, po_ids, options)
+        finally:
+            Vendors.objects.filter(id__in=vendor_ids).delete()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def run(self, vendor_ids, po_ids, options):
+        deadline = time.time() + options["duration"]
+        jobs = [
+            (vendor_ids, po_ids, deadline, options["write_ratio"], options["seed"] + i)
+            for i in range(options["workers"])
+        ]
+        if options["workers"] == 1:
+            results = [run_worker(jobs[0])]
+        else:
+            # children must not share the parent's db connections
+            connections.close_all()
+            with Pool(options["workers"], initializer=django.setup) as pool:
+                results = pool.map(run_worker, jobs)
+
+        report = {
+            "profile": settings.DATABASE_PROFILE,
+            "workers": options["workers"],
+            "duration": options["duration"],
+            "locked_errors": sum(locked for _, locked in results),
+        }
+        for operation in ("read", "write"):
+            timings = sorted(
+                timing for worker, _ in results for timing in worker[operation]
+            )
+            report[operation] = {
+                "count": len(timings),
+                "ops_per_second": round(len(timings) / options["duration"], 2),
+                "p50_ms": round(percentile(timings, 50) * 1000, 3) if timings else None,
+                "p95_ms": round(percentile(timings, 95) * 1000, 3) if timings else None,
+            }
+        return report
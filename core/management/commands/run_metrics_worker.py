@@ -0,0 +1,65 @@
+import time
+from multiprocessing import Pool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.utils import drain_metrics_outbox
+
+
+class Command(BaseCommand):
+    help = "Recalculate vendor performance metrics queued in the metrics outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="vendors recalculated and written together by one worker",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="processes recalculating vendors, 1 runs in this process",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="seconds to wait when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="drain the outbox and exit instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        pool = None
+        map_func = map
+        if options["workers"] > 1:
+            # children must not share the parent's db connections
+            connections.close_all()
+            pool = Pool(options["workers"], initializer=django.setup)
+            map_func = pool.imap_unordered
+
+        try:
+            while True:
+                drained = drain_metrics_outbox(
+                    options["batch_size"], map_func, options["chunk_size"]
+                )
+                if drained:
+                    self.stdout.write(f"recalculated {drained} outbox entries")
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeds.synthetic import SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = "Load a seed-deterministic synthetic dataset of vendors, purchase orders and history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendors", type=int, default=1000)
+        parser.add_argument("--pos", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--days", type=int, default=365, help="days of history ending today"
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of the purchase orders per vendor",
+        )
+        parser.add_argument(
+            "--history-every",
+            type=int,
+            default=50,
+            help="purchase orders of a vendor between two history snapshots",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--transaction-size",
+            type=int,
+            default=200000,
+            help="purchase orders written per transaction",
+        )
+
+    def handle(self, *args, **options):
+        for option in ("vendors", "history_every", "chunk_size"):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
+        if options["pos"] < 0:
+            raise CommandError("--pos can't be negative")
+        dataset = SyntheticDataset(
+            options["vendors"],
+            options["pos"],
+            seed=options["seed"],
+            days=options["days"],
+            skew=options["skew"],
+            history_every=options["history_every"],
+        )
+        if dataset.exists():
+            raise CommandError(f"seed {options['seed']} is already loaded")
+
+        started = time.monotonic()
+        dataset.write(
+            options["chunk_size"], options["transaction_size"], log=self.stdout.write
+        )
+        self.stdout.write(
+            f"loaded {options['vendors']} vendors and {options['pos']} purchase "
+            f"orders in {time.monotonic() - started:.1f}s"
+        )
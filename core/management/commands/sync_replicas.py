@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replication import sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = "Keep the SQLite read replicas in sync with the primary database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="seconds between two copies, keep it below REPLICA_PIN_SECONDS",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=-1,
+            help="pages copied per backup step, -1 copies everything at once",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="copy once and exit instead of looping"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("DATABASE_REPLICAS is empty")
+        try:
+            while True:
+                started = time.monotonic()
+                for alias in settings.DATABASE_REPLICAS:
+                    sync_sqlite_replica(alias, options["pages"])
+                if options["once"]:
+                    break
+                elapsed = time.monotonic() - started
+                time.sleep(max(options["interval"] - elapsed, 0))
+        except KeyboardInterrupt:
+            pass
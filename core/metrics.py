@@ -0,0 +1,322 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from core.db import observe_queries
+
+# name -> (type, help)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "Requests served by URL name, method and status",
+    ),
+    "http_request_errors_total": ("counter", "Requests answered with a 5xx status"),
+    "http_request_duration_seconds": ("histogram", "Request latency by URL name"),
+    "db_queries_total": ("counter", "Database queries run by requests, by URL name"),
+    "vendor_metrics_recalculation_seconds": (
+        "histogram",
+        "Time spent recalculating vendor performance metrics",
+    ),
+}
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+_HEADER = struct.Struct("i4x")
+_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+
+
+class ValueStore:
+    """
+    Doubles keyed by strings, packed in a buffer only this process writes
+    to: a mmap'd file in METRICS_DIR, so /metrics in any worker can add
+    up every worker's file, or memory when there is no METRICS_DIR.
+    Entries are appended as [key length][key, padded to 8][value].
+    """
+
+    def __init__(self, path=None, size=64 * 1024):
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = None
+        self.path = path
+        if path:
+            self._file = open(path, "a+b")
+            self._file.truncate(size)
+            self._buffer = mmap.mmap(self._file.fileno(), size)
+        else:
+            self._buffer = bytearray(size)
+        self._used = _HEADER.size
+        _HEADER.pack_into(self._buffer, 0, self._used)
+
+    def inc(self, key, amount=1):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._append(key)
+            (value,) = _VALUE.unpack_from(self._buffer, position)
+            _VALUE.pack_into(self._buffer, position, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = _LENGTH.size + len(encoded)
+        padded += -padded % 8
+        end = self._used + padded + _VALUE.size
+        if end > len(self._buffer):
+            self._grow(end)
+
+        _LENGTH.pack_into(self._buffer, self._used, len(encoded))
+        self._buffer[
+            self._used + _LENGTH.size : self._used + _LENGTH.size + len(encoded)
+        ] = encoded
+        position = self._used + padded
+        _VALUE.pack_into(self._buffer, position, 0)
+        # readers only see the entry once it is complete
+        self._used = end
+        _HEADER.pack_into(self._buffer, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def _grow(self, needed):
+        size = len(self._buffer)
+        while size < needed:
+            size *= 2
+        if self._file is None:
+            self._buffer.extend(bytes(size - len(self._buffer)))
+            return
+        self._buffer.close()
+        self._file.truncate(size)
+        self._buffer = mmap.mmap(self._file.fileno(), size)
+
+    def read(self):
+        return read_values(self._buffer)
+
+
+def read_values(buffer):
+    values = {}
+    (used,) = _HEADER.unpack_from(buffer, 0)
+    position = _HEADER.size
+    while position < used:
+        (length,) = _LENGTH.unpack_from(buffer, position)
+        start = position + _LENGTH.size
+        key = bytes(buffer[start : start + length]).decode()
+        position = start + length
+        position += -position % 8
+        (values[key],) = _VALUE.unpack_from(buffer, position)
+        position += _VALUE.size
+    return values
+
+
+_store = None
+_store_owner = None
+_store_lock = threading.Lock()
+
+
+def _get_store():
+    """
+    The store of this process, opened again after a fork or when
+    METRICS_DIR changes
+    """
+    global _store, _store_owner
+    owner = (os.getpid(), settings.METRICS_DIR)
+    if _store_owner == owner:
+        return _store
+    with _store_lock:
+        # a second store on the same file would reset what the first wrote
+        if _store_owner != owner:
+            path = None
+            if settings.METRICS_DIR:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                path = os.path.join(settings.METRICS_DIR, f"{os.getpid()}.db")
+            _store = ValueStore(path)
+            _store_owner = owner
+    return _store
+
+
+def _get_key(name, labels, suffix=""):
+    return json.dumps([name + suffix, sorted(labels.items())])
+
+
+def inc(name, amount=1, **labels):
+    _get_store().inc(_get_key(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    store = _get_store()
+    bucket = next(bound for bound in BUCKETS if value <= bound)
+    store.inc(_get_key(name, {**labels, "le": bucket}, "_bucket"))
+    store.inc(_get_key(name, labels, "_sum"), value)
+    store.inc(_get_key(name, labels, "_count"))
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Observe the duration of the block, or the decorated function
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def collect():
+    """
+    Values of every process writing to METRICS_DIR added up, or of this
+    process alone
+    """
+    store = _get_store()
+    if store.path is None:
+        return store.read()
+
+    values = {}
+    for filename in os.listdir(settings.METRICS_DIR):
+        if not filename.endswith(".db"):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, filename), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            continue
+        if len(data) < _HEADER.size:
+            continue
+        for key, value in read_values(data).items():
+            values[key] = values.get(key, 0) + value
+    return values
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            label,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for label, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+def render():
+    """
+    Prometheus text exposition of the collected values
+    """
+    samples = {name: [] for name in METRICS}
+    buckets = {}
+    for key, value in collect().items():
+        sample, labels = json.loads(key)
+        labels = [tuple(label) for label in labels]
+        if sample.endswith("_bucket"):
+            name = sample[: -len("_bucket")]
+            le = dict(labels)["le"]
+            series = tuple(label for label in labels if label[0] != "le")
+            buckets.setdefault((name, series), {})[le] = value
+            continue
+        name = sample
+        for suffix in ("_sum", "_count"):
+            if sample.endswith(suffix) and sample[: -len(suffix)] in METRICS:
+                name = sample[: -len(suffix)]
+        if name in samples:
+            samples[name].append((sample, labels, value))
+
+    # buckets are stored per bound, the exposition wants them cumulative
+    for (name, series), counts in buckets.items():
+        total = 0
+        for bound in BUCKETS:
+            total += counts.get(bound, 0)
+            labels = [*series, ("le", _format_bound(bound))]
+            samples[name].append((f"{name}_bucket", labels, total))
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample, labels, value in sorted(samples[name], key=_sort_key):
+            lines.append(f"{sample}{_format_labels(labels)} {value!r}")
+    return "\n".join(lines) + "\n"
+
+
+def _sort_key(sample):
+    name, labels, _ = sample
+    series = [label for label in labels if label[0] != "le"]
+    le = dict(labels).get("le")
+    bound = math.inf if le == "+Inf" else float(le) if le else 0
+    return series, name, bound
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
+
+
+class MetricsMiddleware:
+    """
+    Count requests, 5xx errors, latency and db queries per URL name
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure(request) as record:
+            response = self.get_response(request)
+            record(response)
+        return response
+
+    async def __acall__(self, request):
+        with self.measure(request) as record:
+            response = await self.get_response(request)
+            record(response)
+        return response
+
+    @contextmanager
+    def measure(self, request):
+        queries = 0
+        response = None
+
+        def count_query(seconds):
+            nonlocal queries
+            queries += 1
+
+        def record(value):
+            nonlocal response
+            response = value
+
+        start = time.perf_counter()
+        with observe_queries(count_query):
+            yield record
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = match.view_name if match else "unmatched"
+        inc(
+            "http_requests_total",
+            url_name=url_name,
+            method=request.method,
+            status=response.status_code,
+        )
+        if response.status_code >= 500:
+            inc("http_request_errors_total", url_name=url_name)
+        observe("http_request_duration_seconds", duration, url_name=url_name)
+        if queries:
+            inc("db_queries_total", queries, url_name=url_name)
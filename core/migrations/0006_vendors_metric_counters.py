@@ -0,0 +1,87 @@
+# Generated by Django 4.2 on 2026-10-18 17:37
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+
+def backfill_counters(apps, schema_editor):
+    Vendors = apps.get_model("core", "Vendors")
+    PurchaseOrder = apps.get_model("core", "PurchaseOrder")
+
+    completed = Q(status="completed")
+    acknowledged = Q(acknowledgment_date__isnull=False, issue_date__isnull=False)
+    for vendor in Vendors.objects.iterator():
+        counters = PurchaseOrder.objects.filter(fk_vendor=vendor).aggregate(
+            completed_po_count=Count("id", filter=completed),
+            on_time_po_count=Count(
+                "id", filter=completed & Q(completed_date__lte=F("delivery_date"))
+            ),
+            issue_free_po_count=Count(
+                "id", filter=completed & Q(issue_order__isnull=True)
+            ),
+            rated_po_count=Count(
+                "id", filter=completed & Q(quality_rating__isnull=False)
+            ),
+            quality_rating_sum=Sum("quality_rating", filter=completed),
+            acknowledged_po_count=Count("id", filter=acknowledged),
+            response_time_sum=Sum(
+                ExpressionWrapper(
+                    F("acknowledgment_date") - F("issue_date"),
+                    output_field=DurationField(),
+                ),
+                filter=acknowledged,
+            ),
+        )
+        counters["quality_rating_sum"] = counters["quality_rating_sum"] or 0
+        counters["response_time_sum"] = (
+            counters["response_time_sum"] or timedelta(0)
+        ).total_seconds()
+        Vendors.objects.filter(pk=vendor.pk).update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_purchaseorder_issue_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendors',
+            name='acknowledged_po_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='completed_po_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='issue_free_po_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='on_time_po_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='quality_rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='rated_po_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendors',
+            name='response_time_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
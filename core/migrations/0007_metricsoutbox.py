@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 17:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_vendors_metric_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('metrics', models.CharField(max_length=225)),
+                ('fk_vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics_outbox_vendor', to='core.vendors', verbose_name='Vendor')),
+            ],
+            options={
+                'db_table': 'metrics_outbox',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_metricsoutbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PurchaseOrderSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefix", models.CharField(max_length=25)),
+                ("period", models.CharField(max_length=6)),
+                ("last_number", models.IntegerField(default=0)),
+            ],
+            options={
+                "db_table": "purchase_order_sequences",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="purchaseordersequence",
+            constraint=models.UniqueConstraint(
+                fields=("prefix", "period"), name="unique_po_sequence_period"
+            ),
+        ),
+    ]
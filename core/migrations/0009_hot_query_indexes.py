@@ -0,0 +1,59 @@
+# Generated by Django 4.2 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_purchaseordersequence"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="historicalperformances",
+            index=models.Index(
+                fields=["fk_vendor", "created_at"], name="history_vendor_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["fk_vendor", "status", "completed_date", "delivery_date"],
+                name="po_vendor_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                condition=models.Q(
+                    ("acknowledgment_date__isnull", False),
+                    ("issue_date__isnull", False),
+                ),
+                fields=["fk_vendor"],
+                name="po_vendor_acknowledged_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["status"], name="po_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["status", "delivery_date"], name="po_status_delivery_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["order_date"], name="po_order_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["delivery_date"], name="po_delivery_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(fields=["completed_date"], name="po_completed_date_idx"),
+        ),
+    ]
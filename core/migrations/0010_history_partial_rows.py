@@ -0,0 +1,86 @@
+# Generated by Django 4.2 on 2026-10-18 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils.dateparse import parse_datetime
+
+METRICS = (
+    "on_time_delivery_rate",
+    "quality_rating_avg",
+    "average_response_time",
+    "fulfillment_rate",
+)
+
+
+def get_consolidated_since(connection):
+    """
+    When history rows started holding all four metrics: the
+    HISTORY_CONSOLIDATED_SINCE setting, or else when 0007 was applied, the
+    last migration released while each metric wrote its own row
+    """
+    if settings.HISTORY_CONSOLIDATED_SINCE:
+        return parse_datetime(settings.HISTORY_CONSOLIDATED_SINCE)
+    return (
+        MigrationRecorder(connection)
+        .migration_qs.filter(app="core", name="0007_metricsoutbox")
+        .values_list("applied", flat=True)
+        .first()
+    )
+
+
+def null_unwritten_metrics(apps, schema_editor):
+    """
+    Rows written before the snapshots were consolidated recorded a single
+    metric and left the other three at 0, their zeros get nulled and the
+    history carries each metric forward from the last row that recorded
+    it. A legacy row recording a 0 can't be told apart from its defaults
+    and is nulled whole.
+    """
+    HistoricalPerformances = apps.get_model("core", "HistoricalPerformances")
+    consolidated_since = get_consolidated_since(schema_editor.connection)
+    if consolidated_since is None:
+        return
+    legacy = HistoricalPerformances.objects.using(
+        schema_editor.connection.alias
+    ).filter(created_at__lt=consolidated_since)
+    for metric in METRICS:
+        legacy.filter(**{metric: 0}).update(**{metric: None})
+
+
+def zero_unwritten_metrics(apps, schema_editor):
+    HistoricalPerformances = apps.get_model("core", "HistoricalPerformances")
+    history = HistoricalPerformances.objects.using(schema_editor.connection.alias)
+    for metric in METRICS:
+        history.filter(**{f"{metric}__isnull": True}).update(**{metric: 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="historicalperformances",
+            name="average_response_time",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicalperformances",
+            name="fulfillment_rate",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicalperformances",
+            name="on_time_delivery_rate",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicalperformances",
+            name="quality_rating_avg",
+            field=models.FloatField(null=True),
+        ),
+        migrations.RunPython(null_unwritten_metrics, zero_unwritten_metrics),
+    ]
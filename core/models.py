@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.utils.translation import gettext_lazy as _
 
 from core.behaviors import Timestampable
@@ -19,6 +19,15 @@ class Vendors(Timestampable, models.Model):
     quality_rating_avg = models.FloatField(default=0)
     average_response_time = models.FloatField(default=0)
     fulfillment_rate = models.FloatField(default=0)
+    # running aggregates kept in sync by core.utils on every PO transition
+    completed_po_count = models.IntegerField(default=0)
+    on_time_po_count = models.IntegerField(default=0)
+    issue_free_po_count = models.IntegerField(default=0)
+    rated_po_count = models.IntegerField(default=0)
+    quality_rating_sum = models.FloatField(default=0)
+    acknowledged_po_count = models.IntegerField(default=0)
+    # sum of acknowledgment_date - issue_date in seconds
+    response_time_sum = models.FloatField(default=0)
 
     class Meta:
         ordering = ["id"]
@@ -27,8 +36,31 @@ class Vendors(Timestampable, models.Model):
     def __str__(self):
         return str(self.name)
 
+    def delete(self, using=None, keep_parents=False):
+        # the orders go first with one DELETE: their metric signals would
+        # load every order only to update the vendor being deleted
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            deleted_orders = self.po_vendor.using(using)._raw_delete(using)
+            deleted, rows = super().delete(using=using, keep_parents=keep_parents)
+        if deleted_orders:
+            rows[PurchaseOrder._meta.label] = deleted_orders
+        return deleted + deleted_orders, rows
+
 
 class PurchaseOrder(Timestampable, models.Model):
+    # fields the vendor performance metrics are derived from
+    METRIC_FIELDS = (
+        "fk_vendor_id",
+        "status",
+        "delivery_date",
+        "completed_date",
+        "issue_order",
+        "quality_rating",
+        "issue_date",
+        "acknowledgment_date",
+    )
+
     po_number = models.CharField(max_length=225, unique=True)
     fk_vendor = models.ForeignKey(
         Vendors,
@@ -56,10 +88,45 @@ class PurchaseOrder(Timestampable, models.Model):
     class Meta:
         ordering = ["-id"]
         db_table = "purchase_orders"
+        indexes = [
+            # completed orders of a vendor, covering the on-time comparison
+            models.Index(
+                fields=["fk_vendor", "status", "completed_date", "delivery_date"],
+                name="po_vendor_status_idx",
+            ),
+            models.Index(
+                fields=["fk_vendor"],
+                condition=models.Q(
+                    acknowledgment_date__isnull=False, issue_date__isnull=False
+                ),
+                name="po_vendor_acknowledged_idx",
+            ),
+            # list filters: an equality index keeps its rows in id order, so
+            # keyset pages of one status (or vendor, through the foreign key
+            # index) are read without a sort
+            models.Index(fields=["status"], name="po_status_idx"),
+            # overdue: pending with the delivery date passed
+            models.Index(
+                fields=["status", "delivery_date"], name="po_status_delivery_idx"
+            ),
+            models.Index(fields=["order_date"], name="po_order_date_idx"),
+            models.Index(fields=["delivery_date"], name="po_delivery_date_idx"),
+            models.Index(fields=["completed_date"], name="po_completed_date_idx"),
+        ]
 
     def __str__(self):
         return str(self.po_number)
 
+    def save(self, *args, **kwargs):
+        # the vendor counter delta and the outbox entry written by the
+        # post_save signal commit or roll back together with the order
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+    def get_metric_state(self):
+        return {name: getattr(self, name) for name in self.METRIC_FIELDS}
+
 
 class HistoricalPerformances(Timestampable, models.Model):
     fk_vendor = models.ForeignKey(
@@ -68,14 +135,66 @@ class HistoricalPerformances(Timestampable, models.Model):
         on_delete=models.CASCADE,
         verbose_name=_("Vendor"),
     )
-    on_time_delivery_rate = models.FloatField(default=0)
-    quality_rating_avg = models.FloatField(default=0)
-    average_response_time = models.FloatField(default=0)
-    fulfillment_rate = models.FloatField(default=0)
+    # null when the row didn't record the metric, rows written before the
+    # snapshots were consolidated hold a single one
+    on_time_delivery_rate = models.FloatField(null=True)
+    quality_rating_avg = models.FloatField(null=True)
+    average_response_time = models.FloatField(null=True)
+    fulfillment_rate = models.FloatField(null=True)
 
     class Meta:
         ordering = ["-id"]
         db_table = "historical_performances"
+        indexes = [
+            models.Index(
+                fields=["fk_vendor", "created_at"], name="history_vendor_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return str(self.fk_vendor.name)
+
+
+class MetricsOutbox(Timestampable, models.Model):
+    """
+    Vendor whose performance metrics are waiting to be recalculated by
+    the run_metrics_worker command
+    """
+
+    fk_vendor = models.ForeignKey(
+        Vendors,
+        related_name="metrics_outbox_vendor",
+        on_delete=models.CASCADE,
+        verbose_name=_("Vendor"),
+    )
+    # comma separated metric names
+    metrics = models.CharField(max_length=225)
+
+    class Meta:
+        ordering = ["id"]
+        db_table = "metrics_outbox"
+
+    def __str__(self):
+        return f"{self.fk_vendor_id}: {self.metrics}"
+
+
+class PurchaseOrderSequence(models.Model):
+    """
+    Last purchase order number handed out per prefix and month
+    """
+
+    prefix = models.CharField(max_length=25)
+    # YYYYMM in the numbering timezone
+    period = models.CharField(max_length=6)
+    last_number = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "purchase_order_sequences"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["prefix", "period"], name="unique_po_sequence_period"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}-{self.period}: {self.last_number}"
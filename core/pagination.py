@@ -0,0 +1,94 @@
+from rest_framework import status
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over the model's own Meta.ordering, every page is a
+    `WHERE id > cursor LIMIT n` index range scan however deep it is
+    """
+
+    page_size_query_param = "limit"
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        return queryset.model._meta.ordering
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views, reading the page with async for.
+        Meta.ordering is the primary key, so a cursor never needs an offset.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = False, None
+        if self.cursor is not None:
+            reverse, position = self.cursor.reverse, self.cursor.position
+
+        order = self.ordering[0]
+        if reverse:
+            queryset = queryset.order_by(
+                *(
+                    field[1:] if field[0] == "-" else f"-{field}"
+                    for field in self.ordering
+                )
+            )
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            lookup = "lt" if reverse != order.startswith("-") else "gt"
+            queryset = queryset.filter(**{f"{order.lstrip('-')}__{lookup}": position})
+
+        results = [item async for item in queryset[: self.page_size + 1]]
+        self.page = results[: self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous = following is not None
+            self.previous_position = following
+        else:
+            self.has_next, self.next_position = following is not None, following
+            self.has_previous = position is not None
+            self.previous_position = position
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "data": data,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "message": "success",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class RankPagination(LimitOffsetPagination):
+    """
+    Limit/offset pages for rankings, a window function has to see every
+    row anyway so there is no index range to seek into
+    """
+
+    default_limit = 100
+    max_limit = 1000
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "data": data,
+                "count": self.count,
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "message": "success",
+            },
+            status=status.HTTP_200_OK,
+        )
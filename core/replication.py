@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.conf import settings
+
+
+def backup_sqlite(source_path, target_path, pages=-1):
+    """
+    Copy a SQLite database with the online backup API: the source keeps
+    serving meanwhile and readers of the target see the new copy once the
+    backup commits
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        target.close()
+        source.close()
+
+
+def sync_sqlite_replica(alias, pages=-1):
+    backup_sqlite(
+        settings.DATABASES["default"]["NAME"],
+        settings.DATABASES[alias]["NAME"],
+        pages,
+    )
@@ -0,0 +1,147 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+_replica = ContextVar("replica", default=None)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Send the reads of this context to one replica, picked once so all the
+    queries of a request read the same copy
+    """
+    replica = None
+    if enabled and settings.DATABASE_REPLICAS:
+        replica = random.choice(settings.DATABASE_REPLICAS)
+    token = _replica.set(replica)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def use_primary():
+    return use_replica(False)
+
+
+def _get_pin_key(user_id):
+    return f"replica_pin:{user_id}"
+
+
+def _get_pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE]
+
+
+def pin_to_primary(user):
+    """
+    Send the user's reads to the primary for REPLICA_PIN_SECONDS, long
+    enough for the replicas to catch up with what they just wrote
+    """
+    if user is not None and user.is_authenticated:
+        _get_pin_cache().set(_get_pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+async def apin_to_primary(user):
+    if user is not None and user.is_authenticated:
+        await _get_pin_cache().aset(
+            _get_pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS
+        )
+
+
+def is_pinned(user):
+    return (
+        user is not None
+        and user.is_authenticated
+        and _get_pin_cache().get(_get_pin_key(user.pk)) is not None
+    )
+
+
+async def ais_pinned(user):
+    return (
+        user is not None
+        and user.is_authenticated
+        and await _get_pin_cache().aget(_get_pin_key(user.pk)) is not None
+    )
+
+
+def read_from_replica(func):
+    """
+    Run a view handler's reads on a replica, unless the user wrote
+    something recently
+    """
+
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def ainner(view, request, *args, **kwargs):
+            if not settings.DATABASE_REPLICAS or await ais_pinned(request.user):
+                return await func(view, request, *args, **kwargs)
+            with use_replica():
+                return await func(view, request, *args, **kwargs)
+
+        return ainner
+
+    @wraps(func)
+    def inner(view, request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS or is_pinned(request.user):
+            return func(view, request, *args, **kwargs)
+        with use_replica():
+            return func(view, request, *args, **kwargs)
+
+    return inner
+
+
+class ReplicaRouter:
+    """
+    Writes, and reads outside of use_replica, go to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get() or "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin the user to the primary after any request that may have written
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            pin_to_primary(getattr(request, "user", None))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            await apin_to_primary(getattr(request, "user", None))
+        return response
@@ -0,0 +1,231 @@
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+
+from core.models import HistoricalPerformances, PurchaseOrder, PurchaseStatus, Vendors
+from core.utils import METRIC_CALCULATORS, VENDOR_COUNTERS, get_metric_contribution
+
+ISSUES = ["Damaged items", "Wrong items", "Short shipment", "Missing documents"]
+
+
+@contextmanager
+def keep_timestamps():
+    """
+    Let bulk_create write the generated created_at/order_date values
+    instead of stamping every row with the current time
+    """
+    fields = [
+        field
+        for model in (Vendors, PurchaseOrder, HistoricalPerformances)
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def get_vendor_sizes(rng, vendors, pos, skew):
+    """
+    Split pos between the vendors following a Zipf law, a few vendors get
+    most of the orders like in a real supplier base
+    """
+    weights = [1 / (rank**skew) for rank in range(1, vendors + 1)]
+    rng.shuffle(weights)
+    total = sum(weights)
+    shares = [pos * weight / total for weight in weights]
+    sizes = [int(share) for share in shares]
+    # largest remainder, so the sizes add up to pos exactly
+    remainders = sorted(range(vendors), key=lambda i: sizes[i] - shares[i])[
+        : pos - sum(sizes)
+    ]
+    for i in remainders:
+        sizes[i] += 1
+    return sizes
+
+
+class SyntheticDataset:
+    """
+    Seed-deterministic vendors, purchase orders and history snapshots.
+    Rows are written with chunked bulk_create, so no per-row signal runs;
+    the vendor counters and metrics are accumulated while generating.
+    """
+
+    def __init__(
+        self,
+        vendors,
+        pos,
+        seed=0,
+        days=365,
+        until=None,
+        skew=1.1,
+        history_every=50,
+        prefix="SEED",
+    ):
+        self.vendors = vendors
+        self.pos = pos
+        self.seed = seed
+        self.until = until or datetime.combine(
+            datetime.now(dt_timezone.utc).date(), time(), tzinfo=dt_timezone.utc
+        )
+        self.since = self.until - timedelta(days=days)
+        self.skew = skew
+        self.history_every = history_every
+        self.prefix = f"{prefix}-{seed}"
+
+    def exists(self):
+        return Vendors.objects.filter(
+            vendor_code__startswith=f"{self.prefix}-"
+        ).exists()
+
+    def write(self, chunk_size=5000, transaction_size=200000, log=None):
+        """
+        Write the dataset and return the created vendors, committing every
+        transaction_size purchase orders
+        """
+        rng = random.Random(self.seed)
+        sizes = get_vendor_sizes(rng, self.vendors, self.pos, self.skew)
+        written = 0
+        vendors = []
+        with keep_timestamps():
+            with transaction.atomic():
+                for start in range(0, self.vendors, chunk_size):
+                    vendors += Vendors.objects.bulk_create(
+                        self.generate_vendor(i)
+                        for i in range(start, min(start + chunk_size, self.vendors))
+                    )
+
+            batch = []
+            batch_size = 0
+            for vendor, size in zip(vendors, sizes):
+                batch.append((vendor, size))
+                batch_size += size
+                if batch_size >= transaction_size:
+                    written += self.write_batch(rng, batch, chunk_size)
+                    batch = []
+                    batch_size = 0
+                    if log:
+                        log(f"{written} purchase orders written")
+            written += self.write_batch(rng, batch, chunk_size)
+        if log:
+            log(f"{written} purchase orders written")
+        return vendors
+
+    def write_batch(self, rng, batch, chunk_size):
+        pos = []
+        history = []
+        written = 0
+        with transaction.atomic():
+            for vendor, size in batch:
+                for po, snapshot in self.generate_purchase_orders(rng, vendor, size):
+                    pos.append(po)
+                    if snapshot is not None:
+                        history.append(snapshot)
+                    if len(pos) >= chunk_size:
+                        PurchaseOrder.objects.bulk_create(pos)
+                        written += len(pos)
+                        pos = []
+                    if len(history) >= chunk_size:
+                        HistoricalPerformances.objects.bulk_create(history)
+                        history = []
+            PurchaseOrder.objects.bulk_create(pos)
+            HistoricalPerformances.objects.bulk_create(history)
+            Vendors.objects.bulk_update(
+                [vendor for vendor, _ in batch],
+                [*VENDOR_COUNTERS, *METRIC_CALCULATORS],
+                batch_size=chunk_size,
+            )
+        return written + len(pos)
+
+    def generate_vendor(self, i):
+        return Vendors(
+            name=f"Vendor {i}",
+            contact_details=f"vendor{i}@example.com",
+            address=f"{i} Supply Street",
+            vendor_code=f"{self.prefix}-{i:07d}",
+            created_at=self.since,
+            updated_at=self.until,
+        )
+
+    def generate_purchase_orders(self, rng, vendor, size):
+        """
+        Yield (purchase order, history snapshot or None) in order date
+        order, each vendor with its own lateness, rating, issue and
+        acknowledgment habits
+        """
+        late_probability = rng.betavariate(2, 8)
+        mean_lateness = rng.uniform(6, 96)
+        rating_mean = rng.uniform(2.5, 4.9)
+        issue_probability = rng.betavariate(1, 15)
+        acknowledgment_median = rng.lognormvariate(math.log(8), 1)
+        period = (self.until - self.since).total_seconds()
+        order_offsets = sorted(rng.uniform(0, period) for _ in range(size))
+
+        for counter in VENDOR_COUNTERS:
+            setattr(vendor, counter, 0)
+        for n, offset in enumerate(order_offsets, 1):
+            order_date = self.since + timedelta(seconds=offset)
+            delivery_date = order_date + timedelta(days=rng.randint(3, 30))
+            po = PurchaseOrder(
+                po_number=f"{vendor.vendor_code}-{n:07d}",
+                fk_vendor=vendor,
+                order_date=order_date,
+                delivery_date=delivery_date,
+                items={"sku": f"SKU-{rng.randint(1, 5000):05d}"},
+                quantity=min(int(rng.paretovariate(1.5) * 5), 10000),
+                status=PurchaseStatus.pending,
+                issue_date=order_date,
+                created_at=order_date,
+                updated_at=order_date,
+            )
+            if rng.random() < 0.95:
+                acknowledgment_date = order_date + timedelta(
+                    hours=rng.lognormvariate(math.log(acknowledgment_median), 0.8)
+                )
+                if acknowledgment_date < self.until:
+                    po.acknowledgment_date = po.updated_at = acknowledgment_date
+
+            draw = rng.random()
+            if delivery_date < self.until and draw < 0.03:
+                po.status = PurchaseStatus.canceled
+            elif delivery_date < self.until and draw > 0.08:
+                if rng.random() < late_probability:
+                    shift = rng.expovariate(1 / mean_lateness)
+                else:
+                    shift = -rng.uniform(0, 72)
+                completed_date = max(delivery_date + timedelta(hours=shift), order_date)
+                if completed_date < self.until:
+                    po.status = PurchaseStatus.completed
+                    po.completed_date = po.updated_at = completed_date
+                    if rng.random() < 0.9:
+                        rating = round(rng.gauss(rating_mean, 0.7))
+                        po.quality_rating = min(max(rating, 1), 5)
+                    if rng.random() < issue_probability:
+                        po.issue_order = rng.choice(ISSUES)
+
+            contribution = get_metric_contribution(po.get_metric_state())
+            for counter, value in contribution.items():
+                setattr(vendor, counter, getattr(vendor, counter) + value)
+
+            snapshot = None
+            if n == size or n % self.history_every == 0:
+                for calculate in METRIC_CALCULATORS.values():
+                    calculate(vendor)
+                snapshot = HistoricalPerformances(
+                    fk_vendor=vendor,
+                    created_at=order_date,
+                    updated_at=order_date,
+                    **{
+                        metric: getattr(vendor, metric) for metric in METRIC_CALCULATORS
+                    },
+                )
+            yield po, snapshot
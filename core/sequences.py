@@ -0,0 +1,112 @@
+import threading
+
+import pytz
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import PurchaseOrder, PurchaseOrderSequence
+
+PO_PREFIX = "PO"
+PO_TIMEZONE = pytz.timezone("Asia/Jakarta")
+
+
+def get_po_period(now=None) -> str:
+    local_dt = (now or timezone.now()).astimezone(PO_TIMEZONE)
+    return f"{local_dt.year}{local_dt.month:02d}"
+
+
+def format_po_number(prefix, period, number) -> str:
+    return f"{prefix}-{period}-{number:05d}"
+
+
+def _get_issued_number(prefix, period) -> int:
+    # numbers handed out before the sequence row existed, a range instead
+    # of startswith so the po_number index is used ("." sorts after "-")
+    last_po_number = (
+        PurchaseOrder.objects.filter(
+            po_number__gt=f"{prefix}-{period}-", po_number__lt=f"{prefix}-{period}."
+        )
+        .order_by("-po_number")
+        .values_list("po_number", flat=True)
+        .first()
+    )
+    return int(last_po_number.rsplit("-", 1)[1]) if last_po_number else 0
+
+
+def reserve_po_numbers(prefix, period, count=1) -> int:
+    """
+    Atomically reserve count consecutive numbers and return the first one,
+    the UPDATE locks the sequence row until the transaction ends
+    """
+    sequences = PurchaseOrderSequence.objects.filter(prefix=prefix, period=period)
+    with transaction.atomic():
+        if not sequences.update(last_number=F("last_number") + count):
+            try:
+                with transaction.atomic():
+                    PurchaseOrderSequence.objects.create(
+                        prefix=prefix,
+                        period=period,
+                        last_number=_get_issued_number(prefix, period) + count,
+                    )
+            except IntegrityError:
+                # created by a concurrent request in the meantime
+                sequences.update(last_number=F("last_number") + count)
+        last_number = sequences.values_list("last_number", flat=True).get()
+    return last_number - count + 1
+
+
+class PurchaseOrderNumberAllocator:
+    """
+    Hands out purchase order numbers from the sequence table. With a
+    block_size above 1 each process reserves numbers in blocks and serves
+    the following requests from memory, at the cost of numbers not being
+    in creation order across processes and gaps when a process exits.
+    """
+
+    def __init__(self, prefix=PO_PREFIX, block_size=None):
+        self.prefix = prefix
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.period = None
+        self.next_number = 0
+        self.end_number = 0
+
+    def get_block_size(self):
+        return self.block_size or settings.PO_NUMBER_BLOCK_SIZE
+
+    def allocate(self, count=1) -> list:
+        """
+        Return count consecutive purchase order numbers
+        """
+        period = get_po_period()
+        with self.lock:
+            if period == self.period and self.end_number - self.next_number >= count:
+                first = self.next_number
+                self.next_number += count
+                return self._format(period, first, count)
+
+        block_size = max(self.get_block_size(), count)
+        first = reserve_po_numbers(self.prefix, period, block_size)
+        if block_size > count:
+            # the block only exists once the reservation is committed
+            transaction.on_commit(
+                lambda: self._store_block(period, first + count, first + block_size)
+            )
+        return self._format(period, first, count)
+
+    def _store_block(self, period, next_number, end_number):
+        with self.lock:
+            self.period = period
+            self.next_number = next_number
+            self.end_number = end_number
+
+    def _format(self, period, first, count):
+        return [
+            format_po_number(self.prefix, period, number)
+            for number in range(first, first + count)
+        ]
+
+
+po_number_allocator = PurchaseOrderNumberAllocator()
@@ -1,3 +1,390 @@
-from django.test import TestCase
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import metrics
+from core.db import configure_sqlite
+from core.executors import BoundedExecutor, Overloaded
+from core.filters import filter_purchase_orders
+from core.metrics import ValueStore
+from core.models import (
+    HistoricalPerformances,
+    MetricsOutbox,
+    PurchaseOrder,
+    PurchaseStatus,
+    Vendors,
+)
+from core.replication import backup_sqlite
+from core.sequences import _get_issued_number
+from core.utils import (
+    HISTORY_BUCKETS,
+    VENDOR_COUNTERS,
+    _get_history_querysets,
+    rebuild_vendor_counters,
+    recalculate_vendor_metrics,
+    recalculate_vendors_metrics,
+)
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Runs EXPLAIN on the hot query shapes and fails when one of them reads
+    a whole table instead of an index
+    """
+
+    def setUp(self):
+        self.vendor = Vendors.objects.create(
+            name="Vendor A",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="A123",
+        )
+        self.now = timezone.now()
+
+    def assertPlanUsesIndex(self, plan):
+        tables = [
+            model._meta.db_table
+            for model in (PurchaseOrder, Vendors, HistoricalPerformances)
+        ]
+        full_scans = [
+            line
+            for line in plan.splitlines()
+            for table in tables
+            # sqlite: "SCAN purchase_orders", postgres: "Seq Scan on purchase_orders"
+            if re.search(rf"\bSCAN {table}\b(?! USING)", line)
+            or re.search(rf"Seq Scan on {table}\b", line)
+        ]
+        self.assertFalse(full_scans, f"full table scan in:\n{plan}")
+
+    def assertUsesIndex(self, queryset):
+        self.assertPlanUsesIndex(queryset.explain())
+
+    def assertQueriesUseIndex(self, func, *args, **kwargs):
+        """
+        Runs func and checks the plan of every query it sent
+        """
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+        queries = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(("SELECT", "UPDATE"))
+        ]
+        self.assertTrue(queries)
+        for sql in queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+                plan = "\n".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertPlanUsesIndex(plan)
+
+    def test_vendor_counters_rebuild(self):
+        self.assertQueriesUseIndex(rebuild_vendor_counters, self.vendor)
+
+    def test_issued_po_number_lookup(self):
+        self.assertQueriesUseIndex(_get_issued_number, "PO", "202405")
+
+    def test_vendor_history(self):
+        for bucket in HISTORY_BUCKETS:
+            with self.subTest(bucket):
+                snapshots, last_known = _get_history_querysets(
+                    self.vendor.id, bucket, self.now - timedelta(days=365), self.now
+                )
+                self.assertUsesIndex(snapshots)
+                self.assertUsesIndex(last_known)
+
+    def test_keyset_pages(self):
+        self.assertUsesIndex(PurchaseOrder.objects.filter(id__lt=1000)[:100])
+        self.assertUsesIndex(Vendors.objects.filter(id__gt=1000)[:100])
+        self.assertUsesIndex(MetricsOutbox.objects.filter(id__lte=1000))
+
+    def test_purchase_order_list_filters(self):
+        pos = PurchaseOrder.objects.order_by("-id")
+        since = self.now - timedelta(days=30)
+        for filters in (
+            {"fk_vendor": self.vendor.id},
+            {"status": PurchaseStatus.pending},
+            {"fk_vendor": self.vendor.id, "status": PurchaseStatus.completed},
+            {"overdue": True},
+            {"order_date_after": since, "order_date_before": self.now},
+            # an open ended range is left to walk the id order until the page
+            # is full, it usually matches most rows
+            {"delivery_date_after": since, "delivery_date_before": self.now},
+            {"completed_date_after": since, "completed_date_before": self.now},
+            {"fk_vendor": self.vendor.id, "delivery_date_before": self.now},
+            {"status": PurchaseStatus.completed, "completed_date_after": since},
+        ):
+            with self.subTest(filters):
+                # first page and the next one of the keyset pagination
+                self.assertUsesIndex(filter_purchase_orders(pos, **filters)[:101])
+                self.assertUsesIndex(
+                    filter_purchase_orders(pos.filter(id__lt=1000), **filters)[:101]
+                )
+
+    def test_equality_filters_keep_the_id_order(self):
+        # their index holds the rows of a vendor or status in id order, a
+        # page is the first rows of it instead of a sort of all of them
+        pos = PurchaseOrder.objects.order_by("-id")
+        for filters in ({"fk_vendor": self.vendor.id}, {"status": "pending"}):
+            with self.subTest(filters):
+                plan = filter_purchase_orders(pos, **filters)[:101].explain()
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_full_scan_is_reported(self):
+        with self.assertRaises(AssertionError):
+            self.assertUsesIndex(PurchaseOrder.objects.filter(quantity=5))
+
+
+class SeedDataTestCase(TestCase):
+    def seed(self, **options):
+        options = {"vendors": 5, "pos": 300, "history_every": 20, **options}
+        call_command("seed_data", stdout=StringIO(), **options)
+
+    def dump(self):
+        return list(
+            PurchaseOrder.objects.order_by("po_number").values_list(
+                "po_number",
+                "fk_vendor__vendor_code",
+                "status",
+                "delivery_date",
+                "completed_date",
+                "quality_rating",
+                "acknowledgment_date",
+                "issue_order",
+            )
+        )
+
+    def test_seed_is_deterministic(self):
+        self.seed(seed=7)
+        first = self.dump()
+        Vendors.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(self.dump(), first)
+        self.seed(seed=8)
+        self.assertEqual(PurchaseOrder.objects.count(), 600)
+
+    def test_seeded_counters_match_purchase_orders(self):
+        self.seed()
+        self.assertEqual(Vendors.objects.count(), 5)
+        sizes = sorted(
+            Vendors.objects.annotate(pos=Count("po_vendor")).values_list(
+                "pos", flat=True
+            )
+        )
+        self.assertEqual(sum(sizes), 300)
+        self.assertGreater(sizes[-1], sizes[0])
+
+        for vendor in Vendors.objects.all():
+            seeded = {counter: getattr(vendor, counter) for counter in VENDOR_COUNTERS}
+            rebuild_vendor_counters(vendor)
+            for counter, value in seeded.items():
+                self.assertAlmostEqual(getattr(vendor, counter), value, places=3)
+            history = HistoricalPerformances.objects.filter(fk_vendor=vendor)
+            self.assertTrue(history.exists())
+            self.assertEqual(
+                history.order_by("-created_at").first().fulfillment_rate,
+                vendor.fulfillment_rate,
+            )
+
+        self.assertLess(
+            PurchaseOrder.objects.order_by("created_at").first().created_at,
+            timezone.now() - timedelta(days=300),
+        )
+
+    def test_seed_refuses_to_load_twice(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_seed_options_are_validated(self):
+        for options, message in (
+            ({"vendors": 0}, "--vendors must be at least 1"),
+            ({"history_every": 0}, "--history-every must be at least 1"),
+            ({"chunk_size": 0}, "--chunk-size must be at least 1"),
+            ({"pos": -1}, "--pos can't be negative"),
+        ):
+            with self.subTest(options), self.assertRaisesMessage(CommandError, message):
+                self.seed(**options)
+        self.seed(pos=0)
+        self.assertEqual(Vendors.objects.count(), 5)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+
+class MetricsStoreTestCase(TestCase):
+    def test_values_survive_growth(self):
+        store = ValueStore(size=64)
+        for i in range(100):
+            store.inc(f"key-{i}", i)
+        store.inc("key-7", 0.5)
+        values = store.read()
+        self.assertEqual(len(values), 100)
+        self.assertEqual(values["key-7"], 7.5)
+
+    def test_worker_files_are_added_up(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(METRICS_DIR=directory):
+                other_worker = ValueStore(os.path.join(directory, "1.db"))
+                other_worker.inc(metrics._get_key("db_queries_total", {}), 3)
+                metrics.inc("db_queries_total", 2)
+                metrics.observe("vendor_metrics_recalculation_seconds", 0.2)
+                other_worker.inc(
+                    metrics._get_key(
+                        "vendor_metrics_recalculation_seconds", {"le": 10}, "_bucket"
+                    )
+                )
+                text = metrics.render()
+
+        self.assertIn("db_queries_total 5.0", text)
+        self.assertIn('vendor_metrics_recalculation_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn(
+            'vendor_metrics_recalculation_seconds_bucket{le="0.25"} 1.0', text
+        )
+        self.assertIn(
+            'vendor_metrics_recalculation_seconds_bucket{le="+Inf"} 2.0', text
+        )
+        self.assertIn("vendor_metrics_recalculation_seconds_count 1.0", text)
+
+    def test_first_requests_of_a_process_share_one_store(self):
+        created = []
+
+        class SlowStore(ValueStore):
+            def __init__(self, *args, **kwargs):
+                created.append(self)
+                time.sleep(0.05)
+                super().__init__(*args, **kwargs)
+
+        stores = []
+        barrier = threading.Barrier(8)
+
+        def first_request():
+            barrier.wait()
+            stores.append(metrics._get_store())
+
+        with mock.patch.object(metrics, "ValueStore", SlowStore), mock.patch.object(
+            metrics, "_store_owner", None
+        ), mock.patch.object(metrics, "_store", None):
+            threads = [threading.Thread(target=first_request) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(created), 1)
+        self.assertEqual({id(store) for store in stores}, {id(created[0])})
+
+
+class SQLiteProfileTestCase(TestCase):
+    @override_settings(SQLITE_PRAGMAS={"busy_timeout": 1234, "cache_size": -2048})
+    def test_pragmas_run_on_new_connections(self):
+        configure_sqlite(sender=connection.__class__, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 1234)
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -2048)
+
+    def test_bench_db_reports_reads_and_writes(self):
+        stdout = StringIO()
+        call_command(
+            "bench_db",
+            workers=1,
+            duration=0.3,
+            vendors=2,
+            pos=20,
+            write_ratio=0.5,
+            stdout=stdout,
+        )
+        report = json.loads(stdout.getvalue())
+        self.assertGreater(report["read"]["count"], 0)
+        self.assertGreater(report["write"]["count"], 0)
+        self.assertEqual(report["locked_errors"], 0)
+        # the seeded vendors are removed again
+        self.assertFalse(Vendors.objects.exists())
+
+
+class ReplicationTestCase(TestCase):
+    def test_backup_copies_and_refreshes_the_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary = os.path.join(directory, "primary.sqlite3")
+            replica = os.path.join(directory, "replica.sqlite3")
+            with sqlite3.connect(primary) as db:
+                db.execute("CREATE TABLE vendors (name TEXT)")
+                db.execute("INSERT INTO vendors VALUES ('A')")
+            backup_sqlite(primary, replica)
+
+            reader = sqlite3.connect(replica)
+            self.assertEqual(
+                reader.execute("SELECT name FROM vendors").fetchall(), [("A",)]
+            )
+            with sqlite3.connect(primary) as db:
+                db.execute("INSERT INTO vendors VALUES ('B')")
+            backup_sqlite(primary, replica, pages=1)
+            # an open reader connection sees the refreshed copy
+            self.assertEqual(
+                reader.execute("SELECT count(*) FROM vendors").fetchone(), (2,)
+            )
+            reader.close()
+
+
+class BoundedExecutorTestCase(TestCase):
+    def test_refuses_work_past_max_pending(self):
+        executor = BoundedExecutor(max_workers=1, max_pending=2)
+        release = threading.Event()
+        futures = [executor.submit(release.wait) for _ in range(2)]
+        with self.assertRaises(Overloaded):
+            executor.submit(release.wait)
+
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(executor.submit(sum, [1, 2]).result(timeout=5), 3)
+
+
+class PerformanceSnapshotTestCase(TransactionTestCase):
+    """
+    The vendor metrics and their history row commit together, outside of
+    the transaction TestCase wraps every test in
+    """
+
+    def setUp(self):
+        self.vendor = Vendors.objects.create(
+            name="Vendor A",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="A123",
+            completed_po_count=1,
+            issue_free_po_count=1,
+        )
+
+    def test_failed_snapshot_leaves_the_metrics(self):
+        metrics = ["fulfillment_rate"]
+        failing_inserts = (
+            (
+                mock.patch.object(HistoricalPerformances, "save"),
+                lambda: recalculate_vendor_metrics(self.vendor.id, metrics),
+            ),
+            (
+                mock.patch.object(HistoricalPerformances.objects, "bulk_create"),
+                lambda: recalculate_vendors_metrics([(self.vendor.id, metrics)]),
+            ),
+        )
+        for failing_insert, recalculate in failing_inserts:
+            with failing_insert as insert:
+                insert.side_effect = DatabaseError
+                with self.assertRaises(DatabaseError):
+                    recalculate()
+            self.vendor.refresh_from_db()
+            self.assertEqual(self.vendor.fulfillment_rate, 0)
@@ -0,0 +1,149 @@
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from core.db import observe_queries
+
+logger = logging.getLogger(__name__)
+
+_request_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Seconds spent per category while serving one sampled request
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def record_query(self, seconds):
+        self.queries += 1
+        self.add("db", seconds)
+
+    def get_header(self):
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block, or the decorated function, to the
+    current request's Server-Timing entry `name`. Nested blocks of the
+    same name are only counted once, and it costs a ContextVar lookup when
+    the request is not sampled.
+    """
+    timings = _request_timings.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+
+    timings._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+        timings._active.discard(name)
+
+
+class TimedSerializerMixin:
+    """
+    Count serializer validation and representation as `serializer` time
+    """
+
+    def run_validation(self, *args, **kwargs):
+        with timed("serializer"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        with timed("serializer"):
+            return super().to_representation(*args, **kwargs)
+
+
+class ServerTimingMiddleware:
+    """
+    For a SERVER_TIMING_SAMPLE_RATE share of the requests, report the db,
+    signal handler, serializer and total time in a Server-Timing header
+    and a JSON log line. db time overlaps with the signal handlers that
+    ran the queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+
+        with self.measure() as timings:
+            response = self.get_response(request)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+
+        with self.measure() as timings:
+            response = await self.get_response(request)
+        return self.report(request, response, timings)
+
+    def is_sampled(self):
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        return rate and random.random() < rate
+
+    @contextmanager
+    def measure(self):
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        try:
+            with observe_queries(timings.record_query):
+                start = time.perf_counter()
+                yield timings
+                timings.add("total", time.perf_counter() - start)
+        finally:
+            _request_timings.reset(token)
+
+    def report(self, request, response, timings):
+        response["Server-Timing"] = timings.get_header()
+        match = request.resolver_match
+        logger.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "path": request.path,
+                    "url_name": match.view_name if match else None,
+                    "status": response.status_code,
+                    "db_queries": timings.queries,
+                    **{
+                        f"{name}_ms": round(seconds * 1000, 2)
+                        for name, seconds in timings.durations.items()
+                    },
+                }
+            )
+        )
+        return response
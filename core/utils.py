@@ -1,88 +1,453 @@
 from datetime import timedelta
 
-from django.db.models import Avg, F
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DurationField,
+    ExpressionWrapper,
+    F,
+    Max,
+    Q,
+    Subquery,
+    Sum,
+)
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
 
-from core.models import HistoricalPerformances, PurchaseOrder, PurchaseStatus, Vendors
+from core.cache import invalidate_vendor_performance
+from core.metrics import timer
+from core.models import (
+    HistoricalPerformances,
+    MetricsOutbox,
+    PurchaseOrder,
+    PurchaseStatus,
+    Vendors,
+)
 
+# running aggregates stored on the vendor row
+VENDOR_COUNTERS = (
+    "completed_po_count",
+    "on_time_po_count",
+    "issue_free_po_count",
+    "rated_po_count",
+    "quality_rating_sum",
+    "acknowledged_po_count",
+    "response_time_sum",
+)
 
-def insert_to_history(data: dict):
-    HistoricalPerformances.objects.create(**data)
+# counters each performance metric is derived from
+METRIC_COUNTERS = {
+    "on_time_delivery_rate": ("completed_po_count", "on_time_po_count"),
+    "fulfillment_rate": ("completed_po_count", "issue_free_po_count"),
+    "quality_rating_avg": ("rated_po_count", "quality_rating_sum"),
+    "average_response_time": ("acknowledged_po_count", "response_time_sum"),
+}
 
 
-def calculate_on_time_delivery_rate(vendor: Vendors):
-    pos = PurchaseOrder.objects.filter(
-        fk_vendor=vendor, status=PurchaseStatus.completed
+def _to_python(field_name, value):
+    # views assign raw request values, normalize them like the DB would
+    if value is None:
+        return None
+    value = PurchaseOrder._meta.get_field(field_name).to_python(value)
+    if hasattr(value, "tzinfo") and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def get_metric_contribution(state: dict) -> dict:
+    """
+    Amount a single purchase order adds to each vendor counter
+    """
+    contribution = dict.fromkeys(VENDOR_COUNTERS, 0)
+    if not state:
+        return contribution
+
+    issue_date = _to_python("issue_date", state["issue_date"])
+    acknowledgment_date = _to_python(
+        "acknowledgment_date", state["acknowledgment_date"]
     )
-    completed_po = pos.count()  # count all pos
+    if issue_date and acknowledgment_date:
+        contribution["acknowledged_po_count"] = 1
+        contribution["response_time_sum"] = (
+            acknowledgment_date - issue_date
+        ).total_seconds()
 
-    on_time_deliverd = pos.filter(completed_date__lte=F("delivery_date")).count()
+    if state["status"] == PurchaseStatus.completed:
+        completed_date = _to_python("completed_date", state["completed_date"])
+        delivery_date = _to_python("delivery_date", state["delivery_date"])
+        quality_rating = _to_python("quality_rating", state["quality_rating"])
 
-    on_time_delivery_rate = (
-        (on_time_deliverd / completed_po) * 100 if completed_po > 0 else 0
+        contribution["completed_po_count"] = 1
+        if completed_date and delivery_date and completed_date <= delivery_date:
+            contribution["on_time_po_count"] = 1
+        if state["issue_order"] is None:
+            contribution["issue_free_po_count"] = 1
+        if quality_rating is not None:
+            contribution["rated_po_count"] = 1
+            contribution["quality_rating_sum"] = quality_rating
+
+    return contribution
+
+
+def diff_metric_contributions(old_state: dict, new_state: dict) -> dict:
+    """
+    Counter deltas per vendor id for a purchase order going from
+    old_state to new_state, either of which may be None
+    """
+    deltas = {}
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if not state:
+            continue
+        delta = deltas.setdefault(state["fk_vendor_id"], {})
+        for counter, value in get_metric_contribution(state).items():
+            delta[counter] = delta.get(counter, 0) + sign * value
+
+    return {
+        vendor_id: {counter: value for counter, value in delta.items() if value}
+        for vendor_id, delta in deltas.items()
+        if any(delta.values())
+    }
+
+
+def get_changed_metrics(counters) -> list:
+    return [
+        metric
+        for metric, dependencies in METRIC_COUNTERS.items()
+        if any(counter in counters for counter in dependencies)
+    ]
+
+
+def update_vendor_counters(vendor_id, delta: dict):
+    Vendors.objects.filter(pk=vendor_id).update(
+        **{counter: F(counter) + value for counter, value in delta.items()}
     )
-    vendor.on_time_delivery_rate = on_time_delivery_rate
-    vendor.save()
 
-    insert_to_history(
-        {
-            "fk_vendor_id": vendor.id,
-            "on_time_delivery_rate": on_time_delivery_rate,
-        }
+
+def rebuild_vendor_counters(vendor: Vendors):
+    """
+    Recount the vendor counters from the full purchase order history,
+    only needed to repair counters that drifted from the table
+    """
+    completed = Q(status=PurchaseStatus.completed)
+    acknowledged = Q(acknowledgment_date__isnull=False, issue_date__isnull=False)
+    counters = PurchaseOrder.objects.filter(fk_vendor=vendor).aggregate(
+        completed_po_count=Count("id", filter=completed),
+        on_time_po_count=Count(
+            "id", filter=completed & Q(completed_date__lte=F("delivery_date"))
+        ),
+        issue_free_po_count=Count("id", filter=completed & Q(issue_order__isnull=True)),
+        rated_po_count=Count("id", filter=completed & Q(quality_rating__isnull=False)),
+        quality_rating_sum=Sum("quality_rating", filter=completed),
+        acknowledged_po_count=Count("id", filter=acknowledged),
+        response_time_sum=Sum(
+            ExpressionWrapper(
+                F("acknowledgment_date") - F("issue_date"),
+                output_field=DurationField(),
+            ),
+            filter=acknowledged,
+        ),
     )
+    counters["quality_rating_sum"] = counters["quality_rating_sum"] or 0
+    counters["response_time_sum"] = (
+        counters["response_time_sum"] or timedelta(0)
+    ).total_seconds()
 
-    calculate_fulfillment_rate(vendor, pos)
+    for counter, value in counters.items():
+        setattr(vendor, counter, value)
+    vendor.save(update_fields=list(VENDOR_COUNTERS))
 
 
-def calculate_quality_rating_avg(vendor: Vendors):
-    completed_po = PurchaseOrder.objects.filter(
-        fk_vendor=vendor, status=PurchaseStatus.completed
-    ).exclude(quality_rating=None)
+def calculate_on_time_delivery_rate(vendor: Vendors):
+    completed_po = vendor.completed_po_count
+    on_time_deliverd = vendor.on_time_po_count
 
-    quality_rating_avg = (
-        completed_po.aggregate(Avg("quality_rating"))["quality_rating__avg"] or 0
+    on_time_delivery_rate = (
+        (on_time_deliverd / completed_po) * 100 if completed_po > 0 else 0
     )
-    vendor.quality_rating_avg = quality_rating_avg
-    vendor.save()
+    vendor.on_time_delivery_rate = on_time_delivery_rate
+    return on_time_delivery_rate
 
-    insert_to_history(
-        {
-            "fk_vendor_id": vendor.id,
-            "quality_rating_avg": quality_rating_avg,
-        }
-    )
+
+def calculate_quality_rating_avg(vendor: Vendors):
+    rated_po = vendor.rated_po_count
+
+    quality_rating_avg = vendor.quality_rating_sum / rated_po if rated_po > 0 else 0
+    vendor.quality_rating_avg = quality_rating_avg
+    return quality_rating_avg
 
 
 def calculate_average_response_time(vendor: Vendors):
-    complete_acknowledge_po = PurchaseOrder.objects.filter(
-        fk_vendor=vendor, acknowledgment_date__isnull=False, issue_date__isnull=False
-    )
-    response_times = complete_acknowledge_po.annotate(
-        response_time=Avg(F("acknowledgment_date") - F("issue_date"))
-    ).aggregate(Avg("response_time"))["response_time__avg"] or timedelta(0)
+    acknowledged_po = vendor.acknowledged_po_count
 
-    average_response_time = response_times.total_seconds() / 3600
-    vendor.average_response_time = average_response_time
-    vendor.save()
-    insert_to_history(
-        {
-            "fk_vendor_id": vendor.id,
-            "average_response_time": average_response_time,
-        }
+    response_time = (
+        vendor.response_time_sum / acknowledged_po if acknowledged_po > 0 else 0
     )
+    average_response_time = response_time / 3600
+    vendor.average_response_time = average_response_time
+    return average_response_time
 
 
-def calculate_fulfillment_rate(vendor: Vendors, pos: PurchaseOrder):
-    complete_pos = pos.count()
+def calculate_fulfillment_rate(vendor: Vendors):
+    complete_pos = vendor.completed_po_count
 
-    pos_without_issue = pos.filter(issue_order__isnull=True).count()
+    pos_without_issue = vendor.issue_free_po_count
     fulfillment_rate = (
         (pos_without_issue / complete_pos) * 100 if complete_pos > 0 else 0
     )
     vendor.fulfillment_rate = fulfillment_rate
-    vendor.save()
-    insert_to_history(
-        {
-            "fk_vendor_id": vendor.id,
-            "fulfillment_rate": fulfillment_rate,
-        }
+    return fulfillment_rate
+
+
+METRIC_CALCULATORS = {
+    "on_time_delivery_rate": calculate_on_time_delivery_rate,
+    "fulfillment_rate": calculate_fulfillment_rate,
+    "quality_rating_avg": calculate_quality_rating_avg,
+    "average_response_time": calculate_average_response_time,
+}
+
+
+def get_performance_snapshot(vendor: Vendors) -> HistoricalPerformances:
+    return HistoricalPerformances(
+        fk_vendor_id=vendor.id,
+        **{metric: getattr(vendor, metric) for metric in METRIC_CALCULATORS},
+    )
+
+
+def write_performance_snapshot(vendor: Vendors, metrics):
+    """
+    Persist the recalculated metrics with one UPDATE of their columns and
+    record all current metrics in a single history row, together: the
+    latest history row is the version of the metrics
+    """
+    with transaction.atomic(savepoint=False):
+        vendor.save(update_fields=list(metrics))
+        get_performance_snapshot(vendor).save()
+
+
+@timer("vendor_metrics_recalculation_seconds", mode="single")
+def recalculate_vendor_metrics(vendor_id, metrics):
+    vendor = Vendors.objects.filter(pk=vendor_id).first()
+    if vendor is None or not metrics:
+        return
+
+    for metric in metrics:
+        METRIC_CALCULATORS[metric](vendor)
+    write_performance_snapshot(vendor, metrics)
+
+
+@timer("vendor_metrics_recalculation_seconds", mode="batch")
+def recalculate_vendors_metrics(dirty):
+    """
+    Bulk variant of recalculate_vendor_metrics for (vendor_id, metrics)
+    pairs: one SELECT, one UPDATE and one history INSERT per batch
+    """
+    dirty = dict(dirty)
+    vendors = Vendors.objects.in_bulk(list(dirty))
+    if not vendors:
+        return 0
+
+    changed = set()
+    for vendor_id, vendor in vendors.items():
+        for metric in dirty[vendor_id]:
+            METRIC_CALCULATORS[metric](vendor)
+            changed.add(metric)
+
+    fields = [metric for metric in METRIC_CALCULATORS if metric in changed]
+    with transaction.atomic(savepoint=False):
+        Vendors.objects.bulk_update(vendors.values(), fields)
+        invalidate_vendor_performance(vendors)
+        HistoricalPerformances.objects.bulk_create(
+            [get_performance_snapshot(vendor) for vendor in vendors.values()]
+        )
+    return len(vendors)
+
+
+def enqueue_vendor_metrics(vendor_id, metrics):
+    MetricsOutbox.objects.create(fk_vendor_id=vendor_id, metrics=",".join(metrics))
+
+
+def drain_metrics_outbox(batch_size=500, map_func=map, chunk_size=100) -> int:
+    """
+    Recalculate the vendors of the oldest outbox entries, once per vendor
+    however many entries it has, and remove the entries afterwards so a
+    crashed run is picked up again. map_func lets the caller spread the
+    chunks of vendors over a process pool.
+    """
+    entries = list(
+        MetricsOutbox.objects.order_by("id").values_list(
+            "id", "fk_vendor_id", "metrics"
+        )[:batch_size]
+    )
+    if not entries:
+        return 0
+
+    dirty = {}
+    for _, vendor_id, metrics in entries:
+        dirty.setdefault(vendor_id, set()).update(metrics.split(","))
+    work = [
+        (vendor_id, [metric for metric in METRIC_COUNTERS if metric in metrics])
+        for vendor_id, metrics in dirty.items()
+    ]
+    chunks = [work[i : i + chunk_size] for i in range(0, len(work), chunk_size)]
+    list(map_func(recalculate_vendors_metrics, chunks))
+
+    # an entry with a lower id may commit while this batch runs, only the
+    # ones recalculated here are done
+    MetricsOutbox.objects.filter(id__in=[entry[0] for entry in entries]).delete()
+    return len(entries)
+
+
+def apply_purchase_order_transition(old_state: dict, new_state: dict):
+    """
+    Update the vendor counters and the metrics depending on them for a
+    purchase order change, a constant number of queries per vendor.
+    With VENDOR_METRICS_OUTBOX the metrics are left to run_metrics_worker.
+    """
+    for vendor_id, delta in diff_metric_contributions(old_state, new_state).items():
+        # the delta only exists now, so the counters are always updated
+        # inline, in the same transaction as the outbox entry
+        with transaction.atomic(savepoint=False):
+            update_vendor_counters(vendor_id, delta)
+            if settings.VENDOR_METRICS_OUTBOX:
+                enqueue_vendor_metrics(vendor_id, get_changed_metrics(delta))
+            else:
+                recalculate_vendor_metrics(vendor_id, get_changed_metrics(delta))
+
+
+def apply_purchase_order_transitions(transitions):
+    """
+    apply_purchase_order_transition for many (old_state, new_state) pairs,
+    the deltas are summed so every vendor is updated and recalculated once
+    """
+    deltas = {}
+    for old_state, new_state in transitions:
+        for vendor_id, delta in diff_metric_contributions(old_state, new_state).items():
+            total = deltas.setdefault(vendor_id, {})
+            for counter, value in delta.items():
+                total[counter] = total.get(counter, 0) + value
+
+    dirty = []
+    for vendor_id, delta in deltas.items():
+        delta = {counter: value for counter, value in delta.items() if value}
+        if delta:
+            update_vendor_counters(vendor_id, delta)
+            dirty.append((vendor_id, get_changed_metrics(delta)))
+
+    if not dirty:
+        return
+    if settings.VENDOR_METRICS_OUTBOX:
+        MetricsOutbox.objects.bulk_create(
+            [
+                MetricsOutbox(fk_vendor_id=vendor_id, metrics=",".join(metrics))
+                for vendor_id, metrics in dirty
+            ]
+        )
+    else:
+        recalculate_vendors_metrics(dirty)
+
+
+HISTORY_BUCKETS = {
+    "hour": (TruncHour, timedelta(hours=1)),
+    "day": (TruncDay, timedelta(days=1)),
+    "week": (TruncWeek, timedelta(weeks=1)),
+}
+
+
+def _truncate(value, bucket):
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if bucket == "hour":
+        return value
+    value = value.replace(hour=0)
+    if bucket == "week":
+        value -= timedelta(days=value.weekday())
+    return value
+
+
+def _get_history_querysets(vendor_id, bucket, start, end):
+    trunc, _ = HISTORY_BUCKETS[bucket]
+    history = HistoricalPerformances.objects.filter(fk_vendor_id=vendor_id)
+    in_range = history.filter(created_at__gte=start, created_at__lt=end).annotate(
+        bucket=trunc("created_at", tzinfo=timezone.get_current_timezone())
+    )
+    metrics = list(METRIC_CALCULATORS)
+    # the last row of every bucket recording each metric, a partial row
+    # records a single one
+    last_per_bucket = Q()
+    for metric in metrics:
+        last_per_bucket |= Q(
+            id__in=in_range.filter(**{f"{metric}__isnull": False})
+            .values("bucket")
+            .annotate(last_id=Max("id"))
+            .values("last_id")
+        )
+    snapshots = (
+        history.filter(last_per_bucket)
+        .order_by("id")
+        .values_list("created_at", *metrics)
+    )
+    before = history.filter(created_at__lt=start).order_by("-id")
+    last_known = Vendors.objects.filter(id=vendor_id).values_list(
+        *(
+            Subquery(before.filter(**{f"{metric}__isnull": False}).values(metric)[:1])
+            for metric in metrics
+        )
+    )
+    return snapshots, last_known
+
+
+def _fill_history(snapshot_rows, last_known, bucket, start, end) -> list:
+    _, step = HISTORY_BUCKETS[bucket]
+    timezone_info = timezone.get_current_timezone()
+    metrics = list(METRIC_CALCULATORS)
+    snapshots = {}
+    for created_at, *values in snapshot_rows:
+        current = _truncate(created_at.astimezone(timezone_info), bucket)
+        snapshots.setdefault(current, []).append(values)
+
+    known = dict(zip(metrics, last_known or [None] * len(metrics)))
+    points = []
+    current = _truncate(start.astimezone(timezone_info), bucket)
+    while current < end:
+        recorded = set()
+        # in id order, the last row recording a metric wins
+        for values in snapshots.get(current, ()):
+            for metric, value in zip(metrics, values):
+                if value is not None:
+                    known[metric] = value
+                    recorded.add(metric)
+        if any(value is not None for value in known.values()):
+            points.append(
+                {
+                    "bucket": current,
+                    **known,
+                    "carried_forward": any(
+                        known[metric] is not None and metric not in recorded
+                        for metric in metrics
+                    ),
+                }
+            )
+        current += step
+    return points
+
+
+def get_performance_history(vendor_id, bucket, start, end) -> list:
+    """
+    Vendor metrics per hour, day or week between start and end: for every
+    metric the last value recorded in each bucket, picked with a GROUP BY
+    in the database, and its last known value carried into buckets
+    without one
+    """
+    snapshots, last_known = _get_history_querysets(vendor_id, bucket, start, end)
+    return _fill_history(list(snapshots), last_known.first(), bucket, start, end)
+
+
+async def aget_performance_history(vendor_id, bucket, start, end) -> list:
+    snapshots, last_known = _get_history_querysets(vendor_id, bucket, start, end)
+    return _fill_history(
+        [row async for row in snapshots],
+        await last_known.afirst(),
+        bucket,
+        start,
+        end,
     )
@@ -0,0 +1,199 @@
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.auth import AsyncJWTAuthentication
+from core.cache import aget_vendor_performance
+from core.exceptions import PuclicException
+from core.fieldsets import SparseFieldset
+from core.filters import filter_purchase_orders
+from core.http import conditional_get
+from core.models import PurchaseOrder, Vendors
+from core.pagination import KeysetPagination
+from core.routers import read_from_replica
+from core.utils import aget_performance_history
+from v1.serializers import (
+    PerformanceHistoryQuerySerializer,
+    PurchaseOrderFilterSerializer,
+    PurchaseOrderListSerializer,
+    VendorListSerializer,
+    VendorPerformanceSerializer,
+)
+from v1.views import (
+    get_purchase_order_validators,
+    get_vendor_performance_validators,
+    get_vendor_validators,
+)
+
+
+def _response(data, **kwargs):
+    # DRF's encoder, so both paths render dates and decimals the same way
+    return JsonResponse(data, encoder=JSONEncoder, **kwargs)
+
+
+class AsyncAPIView(View):
+    """
+    Django async view answering like the DRF views of the same reads, DRF
+    views run in a thread under ASGI. Only JWT authenticated users get in.
+    """
+
+    authentication = AsyncJWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+            if authenticated is None:
+                return _response(
+                    {"message": "Authentication credentials were not provided."},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            request.user, request.auth = authenticated
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+            return _response(detail, status=e.status_code)
+
+
+class AsyncListView(AsyncAPIView):
+    queryset = None
+    serializer_class = None
+
+    async def aget_queryset(self, request, *args, **kwargs):
+        return self.queryset.all()
+
+    @read_from_replica
+    async def get(self, request, *args, **kwargs):
+        fieldset = SparseFieldset(self.serializer_class, request.GET)
+        queryset = await self.aget_queryset(request, *args, **kwargs)
+        try:
+            paginator = KeysetPagination()
+            page = await paginator.apaginate_queryset(
+                fieldset.get_queryset(queryset), Request(request), view=self
+            )
+            serializer = fieldset.trim(self.serializer_class(page, many=True))
+            return _response(paginator.get_paginated_response(serializer.data).data)
+        except Exception as e:
+            return _response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncVendorsView(AsyncListView):
+    queryset = Vendors.objects.all()
+    serializer_class = VendorListSerializer
+
+
+class AsyncPurchaseOrderView(AsyncListView):
+    queryset = PurchaseOrder.objects.select_related("fk_vendor")
+    serializer_class = PurchaseOrderListSerializer
+
+    async def aget_queryset(self, request, *args, **filters):
+        query = PurchaseOrderFilterSerializer(data=request.GET)
+        if not query.is_valid():
+            raise PuclicException(
+                {"message": query.errors, "code": status.HTTP_400_BAD_REQUEST}
+            )
+        return filter_purchase_orders(
+            self.queryset.all(), **{**query.validated_data, **filters}
+        )
+
+
+class AsyncVendorPurchaseOrderView(AsyncPurchaseOrderView):
+    async def aget_queryset(self, request, *args, **kwargs):
+        vendor_id = kwargs["vendor_id"]
+        if not await Vendors.objects.filter(id=vendor_id).aexists():
+            raise NotFound({"message": "Vendor not found"})
+        return await super().aget_queryset(request, fk_vendor=vendor_id)
+
+
+class AsyncVendorDetailView(AsyncAPIView):
+    @read_from_replica
+    @conditional_get(get_vendor_validators)
+    async def get(self, request, *args, **kwargs):
+        fieldset = SparseFieldset(VendorListSerializer, request.GET)
+        try:
+            vendor = await fieldset.get_queryset(Vendors.objects.all()).aget(
+                pk=kwargs["vendor_id"]
+            )
+            serializer = fieldset.trim(VendorListSerializer(vendor))
+            return _response({"data": serializer.data, "message": "success"})
+        except Vendors.DoesNotExist:
+            return _response(
+                {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return _response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class AsyncPurchaseOrderDetailView(AsyncAPIView):
+    @read_from_replica
+    @conditional_get(get_purchase_order_validators)
+    async def get(self, request, *args, **kwargs):
+        fieldset = SparseFieldset(PurchaseOrderListSerializer, request.GET)
+        queryset = PurchaseOrder.objects.select_related("fk_vendor")
+        try:
+            po = await fieldset.get_queryset(queryset).aget(pk=kwargs["po_id"])
+            serializer = fieldset.trim(PurchaseOrderListSerializer(po))
+            return _response({"data": serializer.data, "message": "success"})
+        except PurchaseOrder.DoesNotExist:
+            return _response(
+                {"message": "Purchase order not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return _response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class AsyncVendorPerformanceView(AsyncAPIView):
+    @read_from_replica
+    @conditional_get(get_vendor_performance_validators)
+    async def get(self, request, *args, **kwargs):
+        vendor_id = kwargs["vendor_id"]
+
+        def get_performance():
+            vendor = Vendors.objects.get(id=vendor_id)
+            return dict(VendorPerformanceSerializer(vendor).data)
+
+        try:
+            data = await aget_vendor_performance(vendor_id, get_performance)
+            return _response({"data": data, "message": "success"})
+        except Vendors.DoesNotExist:
+            return _response(
+                {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        except Exception as e:
+            return _response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class AsyncVendorPerformanceHistoryView(AsyncAPIView):
+    @read_from_replica
+    async def get(self, request, *args, **kwargs):
+        try:
+            query = PerformanceHistoryQuerySerializer(data=request.GET)
+            if not query.is_valid():
+                return _response(
+                    {"message": query.errors, "code": status.HTTP_400_BAD_REQUEST},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            vendor_id = kwargs["vendor_id"]
+            if not await Vendors.objects.filter(id=vendor_id).aexists():
+                return _response(
+                    {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            data = await aget_performance_history(vendor_id, **query.validated_data)
+            return _response({"data": data, "message": "success"})
+        except Exception as e:
+            return _response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
@@ -1,13 +1,26 @@
-import pytz
+import math
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import transaction
-from django.db.models import Q
 from django.utils import timezone
 from rest_framework import serializers
 
+from core.filters import PURCHASE_ORDER_DATE_FILTERS
 from core.models import PurchaseOrder, PurchaseStatus, Vendors
+from core.sequences import po_number_allocator
+from core.leaderboard import LEADERBOARD_KPIS
+from core.timing import TimedSerializerMixin
+from core.utils import HISTORY_BUCKETS
+
+
+class ModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    ModelSerializer whose work is reported in the Server-Timing header
+    """
 
 
-class VendorListSerializer(serializers.ModelSerializer):
+class VendorListSerializer(ModelSerializer):
     class Meta:
         model = Vendors
         fields = [
@@ -21,7 +34,7 @@ class VendorListSerializer(serializers.ModelSerializer):
         ]
 
 
-class VendorPerformanceSerializer(serializers.ModelSerializer):
+class VendorPerformanceSerializer(ModelSerializer):
     class Meta:
         model = Vendors
         fields = [
@@ -39,13 +52,13 @@ class VendorPerformanceSerializer(serializers.ModelSerializer):
         ]
 
 
-class VendorCreateSerializer(serializers.ModelSerializer):
+class VendorCreateSerializer(ModelSerializer):
     class Meta:
         model = Vendors
         fields = ["name", "contact_details", "address", "vendor_code"]
 
 
-class VendorUpdateSerializer(serializers.ModelSerializer):
+class VendorUpdateSerializer(ModelSerializer):
     class Meta:
         model = Vendors
         fields = ["name", "contact_details", "address", "vendor_code"]
@@ -57,7 +70,7 @@ class VendorUpdateSerializer(serializers.ModelSerializer):
         }
 
 
-class PurchaseOrderListSerializer(serializers.ModelSerializer):
+class PurchaseOrderListSerializer(ModelSerializer):
     fk_vendor = VendorListSerializer()
 
     class Meta:
@@ -81,7 +94,27 @@ class PurchaseOrderListSerializer(serializers.ModelSerializer):
         ]
 
 
-class PurchaseOrderCreateSerializer(serializers.ModelSerializer):
+class VendorLookupField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves the vendor from context["vendors"] when the caller already
+    loaded them, instead of a query per purchase order
+    """
+
+    def to_internal_value(self, data):
+        vendors = self.context.get("vendors")
+        if vendors is None:
+            return super().to_internal_value(data)
+        try:
+            return vendors[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class PurchaseOrderCreateSerializer(ModelSerializer):
+    fk_vendor = VendorLookupField(queryset=Vendors.objects.all())
+
     class Meta:
         model = PurchaseOrder
         fields = [
@@ -98,26 +131,12 @@ class PurchaseOrderCreateSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         with transaction.atomic():
-            prefix = "PO"
-            now_utc = timezone.now()
-            local_tz = pytz.timezone("Asia/Jakarta")
-            local_dt = now_utc.astimezone(local_tz)
-            last_number = (
-                PurchaseOrder.objects.filter(
-                    Q(created_at__year=local_dt.year, created_at__month=local_dt.month),
-                    po_number__startswith=prefix,
-                ).count()
-                + 1
-            )
-            po_number = (
-                f"{prefix}-{local_dt.year}{local_dt.month:02d}-{last_number:05d}"
-            )
-            validated_data["po_number"] = po_number
+            validated_data["po_number"] = po_number_allocator.allocate()[0]
             instance = super().create(validated_data)
             return instance
 
 
-class PurchaseOrderUpdateSerializer(serializers.ModelSerializer):
+class PurchaseOrderUpdateSerializer(ModelSerializer):
     class Meta:
         model = PurchaseOrder
         fields = [
@@ -141,19 +160,104 @@ class PurchaseOrderUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "po_number", "status"]
 
 
-class AcknowledgePurchaseOrderSerializer(serializers.ModelSerializer):
+class AcknowledgePurchaseOrderSerializer(ModelSerializer):
     class Meta:
         model = PurchaseOrder
         fields = ["acknowledgment_date"]
 
 
-class PurchaseStatusSerializer(serializers.ModelSerializer):
+class PurchaseStatusSerializer(ModelSerializer):
     class Meta:
         model = PurchaseOrder
         fields = ["status"]
+        extra_kwargs = {"status": {"required": True}}
 
 
-class PurchaseQualityRatingSerializer(serializers.ModelSerializer):
+class PurchaseQualityRatingSerializer(ModelSerializer):
     class Meta:
         model = PurchaseOrder
         fields = ["quality_rating"]
+
+
+class PerformanceHistoryQuerySerializer(serializers.Serializer):
+    bucket = serializers.ChoiceField(
+        choices=list(HISTORY_BUCKETS), required=False, default="day"
+    )
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault("end", timezone.now())
+        attrs.setdefault("start", attrs["end"] - timedelta(days=30))
+        if attrs["start"] >= attrs["end"]:
+            raise serializers.ValidationError("start must be before end")
+        buckets = (attrs["end"] - attrs["start"]) / HISTORY_BUCKETS[attrs["bucket"]][1]
+        if buckets > settings.PERFORMANCE_HISTORY_MAX_BUCKETS:
+            raise serializers.ValidationError(
+                f"At most {settings.PERFORMANCE_HISTORY_MAX_BUCKETS} buckets"
+                " per request"
+            )
+        return attrs
+
+
+class PurchaseOrderFilterSerializer(serializers.Serializer):
+    """
+    Filters of the purchase order list, `<date>_after` is inclusive and
+    `<date>_before` exclusive
+    """
+
+    fk_vendor = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=PurchaseStatus.choices, required=False)
+    overdue = serializers.BooleanField(
+        required=False,
+        allow_null=True,
+        default=None,
+        help_text="pending with the delivery date passed, or false for the others",
+    )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in PURCHASE_ORDER_DATE_FILTERS:
+            for bound in ("after", "before"):
+                fields[f"{name}_{bound}"] = serializers.DateTimeField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        for name in PURCHASE_ORDER_DATE_FILTERS:
+            after, before = attrs.get(f"{name}_after"), attrs.get(f"{name}_before")
+            if after is not None and before is not None and after >= before:
+                raise serializers.ValidationError(
+                    f"{name}_after must be before {name}_before"
+                )
+        return attrs
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    sort = serializers.ChoiceField(
+        choices=["composite", *LEADERBOARD_KPIS], required=False, default="composite"
+    )
+    weights = serializers.CharField(
+        required=False,
+        help_text="Composite score weights, e.g. on_time_delivery_rate:2,fulfillment_rate:1",
+    )
+
+    def validate_weights(self, value):
+        weights = {}
+        for item in value.split(","):
+            kpi, _, weight = item.partition(":")
+            kpi = kpi.strip()
+            if kpi not in LEADERBOARD_KPIS:
+                raise serializers.ValidationError(f"Unknown KPI {kpi!r}")
+            try:
+                weights[kpi] = float(weight)
+            except ValueError:
+                raise serializers.ValidationError(f"Invalid weight {weight!r}")
+            if not math.isfinite(weights[kpi]) or weights[kpi] < 0:
+                raise serializers.ValidationError(f"Invalid weight {weight!r}")
+        if not sum(weights.values()) > 0:
+            raise serializers.ValidationError("At least one weight must be positive")
+        return weights
+
+    def validate(self, attrs):
+        attrs.setdefault("weights", settings.VENDOR_LEADERBOARD_WEIGHTS)
+        return attrs
@@ -1,35 +1,84 @@
-import pytz
-from django.db import models
-from django.db.models import Q
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from django.utils import timezone
 
-from core.models import PurchaseOrder, PurchaseStatus
-from core.utils import (
-    calculate_average_response_time,
-    calculate_on_time_delivery_rate,
-    calculate_quality_rating_avg,
-)
+from core.cache import invalidate_vendor_performance
+from core.models import PurchaseOrder, Vendors
+from core.timing import timed
+from core.utils import apply_purchase_order_transition
+
+
+def _get_locked_metric_state(model, pk, using):
+    return (
+        model.objects.using(using)
+        .select_for_update()
+        .filter(pk=pk)
+        .values(*model.METRIC_FIELDS)
+        .first()
+    )
+
+
+@receiver(pre_save, sender=PurchaseOrder)
+@timed("signals")
+def purchase_order_pre_save(sender, instance, raw=False, using=None, **kwargs):
+    if raw or instance.pk is None:
+        return
+    # the state the counters hold, read under a row lock inside the
+    # transaction of PurchaseOrder.save so concurrent changes of the same
+    # order each apply their delta to what the other one committed
+    instance._metric_state = _get_locked_metric_state(sender, instance.pk, using)
 
 
 @receiver(post_save, sender=PurchaseOrder)
-def purchase_order_post_save(sender, instance, created, update_fields=None, **kwargs):
-    if update_fields:
-        vendor = instance.fk_vendor
-
-        if "status" in update_fields and instance.status == PurchaseStatus.completed:
-            calculate_on_time_delivery_rate(vendor)
-
-        if (
-            "quality_rating" in update_fields
-            and instance.status == PurchaseStatus.completed
-        ):
-            calculate_quality_rating_avg(vendor)
-
-        if (
-            "acknowledgment_date" in update_fields
-            and instance.acknowledgment_date
-            and instance.issue_date
-        ):
-            calculate_average_response_time(vendor)
+@timed("signals")
+def purchase_order_post_save(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    if raw:
+        return
+
+    old_state = None if created else getattr(instance, "_metric_state", None)
+    new_state = instance.get_metric_state()
+    if update_fields and old_state:
+        # only the listed fields reached the db
+        saved = set(update_fields)
+        if "fk_vendor" in saved:
+            saved.add("fk_vendor_id")
+        new_state = {
+            name: value if name in saved else old_state[name]
+            for name, value in new_state.items()
+        }
+
+    apply_purchase_order_transition(old_state, new_state)
+    instance.__dict__.pop("_metric_state", None)
+
+
+def _deleted_with_vendor(origin):
+    # the vendor goes away with its orders, nothing left to recalculate
+    return isinstance(origin, Vendors) or getattr(origin, "model", None) is Vendors
+
+
+@receiver(pre_delete, sender=PurchaseOrder)
+@timed("signals")
+def purchase_order_pre_delete(sender, instance, origin=None, using=None, **kwargs):
+    if _deleted_with_vendor(origin):
+        return
+    # None when a concurrent delete already removed the row, the DELETE
+    # then removes nothing and the counters must not lose it twice
+    instance._metric_state = _get_locked_metric_state(sender, instance.pk, using)
+
+
+@receiver(post_delete, sender=PurchaseOrder)
+@timed("signals")
+def purchase_order_post_delete(sender, instance, origin=None, **kwargs):
+    old_state = getattr(instance, "_metric_state", None)
+    if _deleted_with_vendor(origin) or old_state is None:
+        return
+    apply_purchase_order_transition(old_state, None)
+    instance.__dict__.pop("_metric_state", None)
+
+
+@receiver(post_save, sender=Vendors)
+@receiver(post_delete, sender=Vendors)
+@timed("signals")
+def vendor_changed(sender, instance, **kwargs):
+    invalidate_vendor_performance([instance.pk])
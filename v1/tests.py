@@ -1,16 +1,63 @@
+import csv
+import json
+import tempfile
+import threading
+import time
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from core.models import PurchaseOrder, PurchaseStatus, Vendors
+from authentication.models import Account
+from core.auth import account_cache
+from core.cache import (
+    get_or_set_single_flight,
+    get_vendor_leaderboard_version,
+    get_vendor_performance,
+    get_vendor_performance_generation,
+    invalidate_vendor_performance,
+)
+from core.checks import check_replica_pin_cache
+from core.models import (
+    HistoricalPerformances,
+    MetricsOutbox,
+    PurchaseOrder,
+    PurchaseStatus,
+    Vendors,
+)
+from core.routers import ReplicaRouter, use_replica
+from core.sequences import PurchaseOrderNumberAllocator, get_po_period
+from core.utils import (
+    VENDOR_COUNTERS,
+    drain_metrics_outbox,
+    rebuild_vendor_counters,
+    recalculate_vendors_metrics,
+)
 
 now = datetime.now()
 
 
 class BaseTest(APITestCase):
     def setUp(self):
+        cache.clear()
+        caches[settings.GENERATION_CACHE].clear()
+        account_cache.clear()
         self.username = "admin"
         self.password = "admin!@#"
         self.token = self.get_token()
@@ -43,6 +90,20 @@ class BaseTest(APITestCase):
         }
         return PurchaseOrder.objects.create(**data)
 
+    def create_purchase_order(self):
+        return PurchaseOrder.objects.create(
+            po_number=f"PO-TEST-{PurchaseOrder.objects.count():05d}",
+            fk_vendor_id=self.vendor_id,
+            delivery_date=timezone.now() + timedelta(days=10),
+            items={"item1": "Item 1"},
+            quantity=1,
+        )
+
+    def complete(self, po):
+        po.status = PurchaseStatus.completed
+        po.completed_date = timezone.now()
+        po.save(update_fields=["status", "completed_date"])
+
 
 class VendorsAPITestCase(BaseTest):
     def test_list_vendors(self):
@@ -50,6 +111,24 @@ class VendorsAPITestCase(BaseTest):
         response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_list_vendors_pages_with_cursor(self):
+        for code in ("B1", "B2"):
+            Vendors.objects.create(
+                name="Vendor B",
+                contact_details="Contact",
+                address="Address",
+                vendor_code=code,
+            )
+        url = reverse("v1:vendors") + "?limit=2"
+        seen = []
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["data"]), 2)
+            seen += [vendor["id"] for vendor in response.data["data"]]
+            url = response.data["next"]
+        self.assertEqual(seen, list(Vendors.objects.values_list("id", flat=True)))
+
     def test_create_vendor(self):
         url = reverse("v1:vendors")
         data = {
@@ -99,6 +178,22 @@ class PurchaseOrdersAPITestCase(BaseTest):
         response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_list_purchase_order_newest_first(self):
+        self.create_purchase_order()
+        url = reverse("v1:po")
+        response = self.client.get(
+            url, {"limit": 1}, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]), 1)
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(
+            response.data["next"], HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(response.data["data"][0]["id"], self.po_id.id)
+        self.assertIsNone(response.data["next"])
+
     def test_detail_purchase_order(self):
         url = reverse("v1:po_detail", kwargs={"po_id": self.po_id.id})
         response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
@@ -268,3 +363,1474 @@ class PerformanceMetricsTaseCase(BaseTest):
         self.assertEqual(fulfillment_rate, expected_fulfillment_rate)
         self.assertEqual(on_time_delivery_rate, expected_on_time_delivery_rate)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class VendorMetricCountersTestCase(BaseTest):
+    def test_counters_match_full_recount(self):
+        for _ in range(3):
+            po = self.create_purchase_order()
+            po.issue_date = timezone.now()
+            po.acknowledgment_date = timezone.now() + timedelta(hours=2)
+            po.save()
+            self.complete(po)
+            po.quality_rating = 4
+            po.save(update_fields=["quality_rating"])
+        po.issue_order = "damaged"
+        po.save()
+        po.delete()
+
+        vendor = Vendors.objects.get(id=self.vendor_id)
+        incremental = {field: getattr(vendor, field) for field in VENDOR_COUNTERS}
+        rebuild_vendor_counters(vendor)
+        vendor.refresh_from_db()
+        for field in VENDOR_COUNTERS:
+            self.assertAlmostEqual(incremental[field], getattr(vendor, field))
+        self.assertEqual(vendor.completed_po_count, 2)
+        self.assertEqual(vendor.quality_rating_avg, 4)
+        self.assertAlmostEqual(vendor.average_response_time, 2)
+
+    def test_concurrent_changes_apply_their_delta_once(self):
+        po = self.create_purchase_order()
+        # two requests that loaded the order before either one saved it
+        first = PurchaseOrder.objects.get(id=po.id)
+        second = PurchaseOrder.objects.get(id=po.id)
+        self.complete(first)
+        self.complete(second)
+        for rating, copy in ((4, first), (5, second)):
+            copy.quality_rating = rating
+            copy.save(update_fields=["quality_rating"])
+
+        vendor = Vendors.objects.get(id=self.vendor_id)
+        self.assertEqual(vendor.completed_po_count, 1)
+        self.assertEqual(vendor.rated_po_count, 1)
+        self.assertEqual(vendor.quality_rating_sum, 5)
+
+        first.delete()
+        second.delete()
+        vendor.refresh_from_db()
+        for field in VENDOR_COUNTERS:
+            self.assertEqual(getattr(vendor, field), 0, field)
+
+    def test_transition_writes_single_full_snapshot(self):
+        po = self.create_purchase_order()
+        po.issue_date = timezone.now()
+        po.acknowledgment_date = timezone.now() + timedelta(hours=3)
+        po.save()
+
+        history = HistoricalPerformances.objects.count()
+        self.complete(po)
+        self.assertEqual(HistoricalPerformances.objects.count() - history, 1)
+
+        snapshot = HistoricalPerformances.objects.first()
+        self.assertEqual(snapshot.on_time_delivery_rate, 100)
+        self.assertEqual(snapshot.fulfillment_rate, 100)
+        self.assertAlmostEqual(snapshot.average_response_time, 3)
+
+    def test_transition_cost_does_not_grow_with_history(self):
+        po = self.create_purchase_order()
+        with CaptureQueriesContext(connection) as small_history:
+            self.complete(po)
+
+        for _ in range(50):
+            self.complete(self.create_purchase_order())
+        po = self.create_purchase_order()
+        with CaptureQueriesContext(connection) as large_history:
+            self.complete(po)
+
+        self.assertEqual(len(small_history), len(large_history))
+
+
+@override_settings(VENDOR_METRICS_OUTBOX=True)
+class MetricsOutboxTestCase(BaseTest):
+    def test_worker_recalculates_queued_vendors_once(self):
+        for _ in range(3):
+            self.complete(self.create_purchase_order())
+
+        vendor = Vendors.objects.get(id=self.vendor_id)
+        self.assertEqual(vendor.on_time_delivery_rate, 0)
+        self.assertEqual(MetricsOutbox.objects.count(), 3)
+
+        history = HistoricalPerformances.objects.count()
+        call_command("run_metrics_worker", "--once", "--workers", "1", stdout=StringIO())
+
+        vendor.refresh_from_db()
+        self.assertEqual(vendor.on_time_delivery_rate, 100)
+        self.assertEqual(vendor.fulfillment_rate, 100)
+        self.assertFalse(MetricsOutbox.objects.exists())
+        # one row for the vendor, not per queued entry
+        self.assertEqual(HistoricalPerformances.objects.count() - history, 1)
+
+    def test_drain_keeps_entries_committed_meanwhile(self):
+        metrics = "on_time_delivery_rate"
+        MetricsOutbox.objects.create(id=5, fk_vendor_id=self.vendor_id, metrics=metrics)
+        MetricsOutbox.objects.create(id=7, fk_vendor_id=self.vendor_id, metrics=metrics)
+
+        def map_func(func, chunks):
+            # a transaction that took id 6 commits while the batch runs
+            MetricsOutbox.objects.create(
+                id=6, fk_vendor_id=self.vendor_id, metrics=metrics
+            )
+            return map(func, chunks)
+
+        self.assertEqual(drain_metrics_outbox(map_func=map_func), 2)
+        self.assertEqual(list(MetricsOutbox.objects.values_list("id", flat=True)), [6])
+
+    def test_worker_writes_vendors_in_bulk(self):
+        other = Vendors.objects.create(
+            name="Vendor B",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="B1",
+        )
+        self.complete(self.create_purchase_order())
+        po = self.create_purchase_order()
+        po.fk_vendor = other
+        po.save()
+        self.complete(po)
+
+        dirty = [
+            (self.vendor_id, ["on_time_delivery_rate", "fulfillment_rate"]),
+            (other.id, ["on_time_delivery_rate", "fulfillment_rate"]),
+        ]
+        # select, update and history insert for both vendors together
+        with self.assertNumQueries(3):
+            recalculate_vendors_metrics(dirty)
+        self.assertEqual(Vendors.objects.get(id=other.id).fulfillment_rate, 100)
+
+
+class QueryBudgetMixin:
+    """
+    Pins the exact number of queries an endpoint runs, so an N+1 or any
+    other extra query fails the suite with the offending SQL listed
+    """
+
+    def assertQueryBudget(self, budget, method, url, data=None, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                url,
+                data,
+                format="json",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+                **headers,
+            )
+        executed = [
+            query["sql"]
+            for query in queries.captured_queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+        self.assertEqual(len(executed), budget, "\n".join(executed))
+        return response
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        for _ in range(5):
+            self.create_purchase_order()
+        self.vendor_url = reverse(
+            "v1:vendors_detail", kwargs={"vendor_id": self.vendor_id}
+        )
+        self.po_url = reverse("v1:po_detail", kwargs={"po_id": self.po_id.id})
+
+    def test_list_vendors(self):
+        self.assertQueryBudget(1, "get", reverse("v1:vendors"))
+
+    def test_create_vendor(self):
+        data = {
+            "name": "Vendor B",
+            "contact_details": "Contact",
+            "address": "Address",
+            "vendor_code": "B456",
+        }
+        self.assertQueryBudget(2, "post", reverse("v1:vendors"), data)
+
+    def test_detail_vendor(self):
+        self.assertQueryBudget(2, "get", self.vendor_url)
+
+    def test_update_vendor(self):
+        self.assertQueryBudget(2, "put", self.vendor_url, {"name": "Vendor B"})
+
+    def test_delete_vendor(self):
+        self.assertQueryBudget(6, "delete", self.vendor_url)
+
+    def test_delete_vendor_with_orders(self):
+        PurchaseOrder.objects.bulk_create(
+            PurchaseOrder(
+                po_number=f"PO-BULK-{number:05d}",
+                fk_vendor_id=self.vendor_id,
+                items={"item1": "Item 1"},
+            )
+            for number in range(250)
+        )
+        # the orders go in one DELETE instead of being loaded and deleted by
+        # id, 100 per query
+        self.assertQueryBudget(6, "delete", self.vendor_url)
+        self.assertFalse(PurchaseOrder.objects.exists())
+
+    def test_vendor_performance(self):
+        url = reverse("v1:vendors_performance", kwargs={"vendor_id": self.vendor_id})
+        self.assertQueryBudget(2, "get", url)
+
+    def test_list_purchase_order(self):
+        self.assertQueryBudget(1, "get", reverse("v1:po"))
+        # the nested vendor must not cost a query per order
+        for _ in range(20):
+            self.create_purchase_order()
+        self.assertQueryBudget(1, "get", reverse("v1:po"))
+
+    def test_create_purchase_order(self):
+        data = {"fk_vendor": self.vendor_id, "items": {"item1": "Item 1"}}
+        # the first order of the month also creates the sequence row
+        self.assertQueryBudget(6, "post", reverse("v1:po"), data)
+        self.assertQueryBudget(4, "post", reverse("v1:po"), data)
+
+    def test_detail_purchase_order(self):
+        self.assertQueryBudget(2, "get", self.po_url)
+
+    def test_update_purchase_order(self):
+        data = {"issue_date": "2024-05-12T14:39:03.206Z"}
+        # fetch, metric state read under the row lock and save
+        self.assertQueryBudget(3, "put", self.po_url, data)
+
+    def test_delete_purchase_order(self):
+        self.assertQueryBudget(3, "delete", self.po_url)
+
+    def test_purchase_order_transitions(self):
+        self.assertQueryBudget(
+            3, "put", self.po_url, {"issue_date": "2024-05-12T14:39:03.206Z"}
+        )
+        # fetch, metric state, save, counters, vendor, metrics and history
+        url = reverse("v1:po_acknowledge", kwargs={"po_id": self.po_id.id})
+        data = {"acknowledgment_date": "2024-05-13T14:39:03.206Z"}
+        self.assertQueryBudget(7, "post", url, data)
+
+        url = reverse("v1:po_status", kwargs={"po_id": self.po_id.id})
+        self.assertQueryBudget(7, "post", url, {"status": PurchaseStatus.completed})
+
+        url = reverse("v1:po_rating", kwargs={"po_id": self.po_id.id})
+        self.assertQueryBudget(7, "post", url, {"quality_rating": 4})
+
+
+class PurchaseOrderNumberTestCase(BaseTest):
+    def test_numbers_are_sequential_per_month(self):
+        url = reverse("v1:po")
+        data = {"fk_vendor": self.vendor_id, "items": {"item1": "Item 1"}}
+        numbers = [
+            self.client.post(
+                url, data, HTTP_AUTHORIZATION=f"Bearer {self.token}", format="json"
+            ).data["data"]["po_number"]
+            for _ in range(3)
+        ]
+        period = get_po_period()
+        self.assertEqual(numbers, [f"PO-{period}-{number:05d}" for number in (1, 2, 3)])
+
+    def test_sequence_continues_after_existing_numbers(self):
+        period = get_po_period()
+        self.po_id.po_number = f"PO-{period}-00041"
+        self.po_id.save()
+        self.assertEqual(
+            PurchaseOrderNumberAllocator().allocate(2),
+            [f"PO-{period}-00042", f"PO-{period}-00043"],
+        )
+
+    def test_block_allocation_never_overlaps(self):
+        # two processes, each holding its own block of numbers
+        first = PurchaseOrderNumberAllocator(block_size=5)
+        second = PurchaseOrderNumberAllocator(block_size=5)
+        numbers = []
+        for _ in range(4):
+            with self.captureOnCommitCallbacks(execute=True):
+                numbers += first.allocate() + second.allocate()
+        with self.assertNumQueries(0):
+            numbers += first.allocate()
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+
+class PurchaseOrderBulkCreateTestCase(QueryBudgetMixin, BaseTest):
+    def test_bulk_create_reports_each_item(self):
+        item = {"fk_vendor": self.vendor_id, "items": {"item1": "Item 1"}}
+        data = [item, item, {"fk_vendor": 999, "items": {}}, item]
+        response = self.client.post(
+            reverse("v1:po_bulk"),
+            data,
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row["index"] for row in response.data["data"]], [0, 1, 3])
+        self.assertEqual(response.data["errors"][0]["index"], 2)
+        self.assertIn("fk_vendor", response.data["errors"][0]["errors"])
+
+        period = get_po_period()
+        self.assertEqual(
+            [row["po_number"] for row in response.data["data"]],
+            [f"PO-{period}-{number:05d}" for number in (1, 2, 3)],
+        )
+        self.assertEqual(PurchaseOrder.objects.filter(po_number__gt="").count(), 3)
+
+    def test_bulk_create_query_budget(self):
+        item = {"fk_vendor": self.vendor_id, "items": {"item1": "Item 1"}}
+        self.client.post(
+            reverse("v1:po_bulk"),
+            [item],
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            format="json",
+        )
+        # vendors, number block and one insert however many orders
+        self.assertQueryBudget(4, "post", reverse("v1:po_bulk"), [item] * 50)
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(
+            reverse("v1:po_bulk"),
+            {"fk_vendor": self.vendor_id},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PurchaseOrderBatchTransitionTestCase(QueryBudgetMixin, BaseTest):
+    def post_batch(self, name, data):
+        return self.client.post(
+            reverse(name),
+            data,
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            format="json",
+        )
+
+    def test_batch_lifecycle_updates_metrics(self):
+        orders = [self.create_purchase_order() for _ in range(4)]
+        PurchaseOrder.objects.filter(id__in=[po.id for po in orders]).update(
+            issue_date=timezone.now()
+        )
+
+        data = [{"id": po.id, "status": PurchaseStatus.completed} for po in orders]
+        response = self.post_batch("v1:po_batch_status", data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]), 4)
+
+        data = [{"id": po.id, "quality_rating": 2 * i} for i, po in enumerate(orders)]
+        data.append({"id": self.po_id.id, "quality_rating": 5})
+        response = self.post_batch("v1:po_batch_rating", data)
+        self.assertEqual(len(response.data["data"]), 4)
+        self.assertEqual(
+            response.data["errors"],
+            [{"index": 4, "errors": "Can't give rating for uncompleted order"}],
+        )
+
+        acknowledged = (timezone.now() + timedelta(hours=6)).isoformat()
+        data = [{"id": po.id, "acknowledgment_date": acknowledged} for po in orders]
+        data.append({"id": 999, "acknowledgment_date": acknowledged})
+        response = self.post_batch("v1:po_batch_acknowledge", data)
+        self.assertEqual(len(response.data["data"]), 4)
+        self.assertEqual(response.data["errors"][0]["index"], 4)
+
+        vendor = Vendors.objects.get(id=self.vendor_id)
+        self.assertEqual(vendor.on_time_delivery_rate, 100)
+        self.assertEqual(vendor.quality_rating_avg, 3)
+        self.assertAlmostEqual(vendor.average_response_time, 6, places=2)
+        counters = {field: getattr(vendor, field) for field in VENDOR_COUNTERS}
+        rebuild_vendor_counters(vendor)
+        for field, value in counters.items():
+            self.assertAlmostEqual(getattr(vendor, field), value)
+
+    def test_batch_status_query_budget(self):
+        orders = [self.create_purchase_order() for _ in range(30)]
+        data = [{"id": po.id, "status": PurchaseStatus.completed} for po in orders]
+        # fetch, update, counters, then the vendor metrics and history
+        self.assertQueryBudget(6, "post", reverse("v1:po_batch_status"), data)
+        self.assertEqual(Vendors.objects.get(id=self.vendor_id).completed_po_count, 30)
+
+    def test_batch_items_are_validated(self):
+        po = self.create_purchase_order()
+        data = [
+            {"id": po.id},
+            {"id": True, "status": PurchaseStatus.completed},
+            {"id": po.id, "status": PurchaseStatus.canceled},
+        ]
+        response = self.post_batch("v1:po_batch_status", data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"], [{"index": 2, "id": po.id}])
+        self.assertEqual([error["index"] for error in response.data["errors"]], [0, 1])
+        self.assertIn("status", response.data["errors"][0]["errors"])
+        self.assertEqual(
+            response.data["errors"][1]["errors"], "Purchase order not found"
+        )
+
+
+class VendorPerformanceCacheTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse(
+            "v1:vendors_performance", kwargs={"vendor_id": self.vendor_id}
+        )
+
+    def test_performance_is_served_from_cache(self):
+        self.assertQueryBudget(2, "get", self.url)
+        response = self.assertQueryBudget(1, "get", self.url)
+        self.assertEqual(response.data["data"]["id"], self.vendor_id)
+
+    def test_metric_change_invalidates_cache(self):
+        self.assertQueryBudget(2, "get", self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete(self.create_purchase_order())
+        response = self.assertQueryBudget(2, "get", self.url)
+        self.assertEqual(response.data["data"]["on_time_delivery_rate"], 100)
+
+    def test_batch_change_invalidates_cache(self):
+        po = self.create_purchase_order()
+        self.assertQueryBudget(2, "get", self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("v1:po_batch_status"),
+                [{"id": po.id, "status": PurchaseStatus.completed}],
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+                format="json",
+            )
+        response = self.assertQueryBudget(2, "get", self.url)
+        self.assertEqual(response.data["data"]["fulfillment_rate"], 100)
+
+    def test_generations_survive_culling(self):
+        generation = get_vendor_performance_generation(self.vendor_id)
+        version = get_vendor_leaderboard_version()
+        payloads = {
+            **settings.CACHES["default"],
+            "OPTIONS": {"MAX_ENTRIES": 10, "CULL_FREQUENCY": 2},
+        }
+        with self.settings(CACHES={**settings.CACHES, "default": payloads}):
+            for number in range(50):
+                cache.set(f"payload:{number}", number)
+            self.assertLessEqual(len(cache._cache), 10)
+            self.assertEqual(
+                get_vendor_performance_generation(self.vendor_id), generation
+            )
+            self.assertEqual(get_vendor_leaderboard_version(), version)
+
+    def test_fetch_that_raced_an_invalidation_is_not_served(self):
+        def stale_fetch():
+            # the change commits while this fetch holds the old row
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate_vendor_performance([self.vendor_id])
+            return {"on_time_delivery_rate": "stale"}
+
+        self.assertEqual(
+            get_vendor_performance(self.vendor_id, stale_fetch),
+            {"on_time_delivery_rate": "stale"},
+        )
+        self.assertEqual(
+            get_vendor_performance(self.vendor_id, lambda: {"fresh": True}),
+            {"fresh": True},
+        )
+
+    def test_concurrent_misses_fetch_once(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"id": self.vendor_id}
+
+        threads = [
+            threading.Thread(
+                target=get_or_set_single_flight, args=("single_flight", fetch)
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class ConditionalGetTestCase(QueryBudgetMixin, BaseTest):
+    def get(self, url, **headers):
+        return self.client.get(
+            url, HTTP_AUTHORIZATION=f"Bearer {self.token}", **headers
+        )
+
+    def test_unchanged_detail_returns_not_modified(self):
+        for url in (
+            reverse("v1:vendors_detail", kwargs={"vendor_id": self.vendor_id}),
+            reverse("v1:po_detail", kwargs={"po_id": self.po_id.id}),
+            reverse("v1:vendors_performance", kwargs={"vendor_id": self.vendor_id}),
+        ):
+            response = self.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn("ETag", response.headers)
+            self.assertIn("Last-Modified", response.headers)
+
+            # the validator query alone, no fetch or serialization
+            response = self.assertQueryBudget(
+                1, "get", url, HTTP_IF_NONE_MATCH=response.headers["ETag"]
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.get(
+                url, HTTP_IF_MODIFIED_SINCE=response.headers["Last-Modified"]
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_fieldsets_have_their_own_etag(self):
+        url = reverse("v1:po_detail", kwargs={"po_id": self.po_id.id})
+        etag = self.get(url).headers["ETag"]
+        response = self.client.get(
+            url,
+            {"fields": "id,status"},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        # the same fieldset written another way
+        response = self.client.get(
+            url,
+            {"fields": " status, id"},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            HTTP_IF_NONE_MATCH=response.headers["ETag"],
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_status_change_updates_etag(self):
+        url = reverse("v1:po_detail", kwargs={"po_id": self.po_id.id})
+        etag = self.get(url).headers["ETag"]
+        self.client.post(
+            reverse("v1:po_status", kwargs={"po_id": self.po_id.id}),
+            {"status": PurchaseStatus.completed},
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            format="json",
+        )
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metric_change_updates_performance_etag(self):
+        url = reverse("v1:vendors_performance", kwargs={"vendor_id": self.vendor_id})
+        etag = self.get(url).headers["ETag"]
+        self.complete(self.create_purchase_order())
+        self.assertNotEqual(self.get(url).headers["ETag"], etag)
+
+
+class ExportTestCase(BaseTest):
+    def export(self, name, export_format):
+        url = reverse(name, kwargs={"export_format": export_format})
+        # one chunked read, consumed while the response streams
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.streaming)
+            return b"".join(response.streaming_content).decode()
+
+    def test_export_purchase_orders_ndjson(self):
+        for _ in range(3):
+            self.create_purchase_order()
+        rows = [
+            json.loads(line)
+            for line in self.export("v1:po_export", "ndjson").splitlines()
+        ]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["id"], self.po_id.id)
+        self.assertEqual(rows[0]["fk_vendor"], self.vendor_id)
+        self.assertEqual(rows[0]["items"], {"item1": "Item 1", "item2": "Item 2"})
+
+    def test_export_vendors_and_history_csv(self):
+        self.complete(self.create_purchase_order())
+        vendors = list(
+            csv.DictReader(StringIO(self.export("v1:vendors_export", "csv")))
+        )
+        self.assertEqual(vendors[0]["vendor_code"], "A123")
+        self.assertEqual(float(vendors[0]["on_time_delivery_rate"]), 100)
+
+        history = list(
+            csv.DictReader(StringIO(self.export("v1:history_export", "csv")))
+        )
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]["fk_vendor"], str(self.vendor_id))
+
+    def test_export_rejects_unknown_format(self):
+        url = reverse("v1:po_export", kwargs={"export_format": "xml"})
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class VendorPerformanceHistoryTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.start = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        self.url = reverse(
+            "v1:vendors_performance_history", kwargs={"vendor_id": self.vendor_id}
+        )
+
+    def snapshot(self, created_at, on_time_delivery_rate=None, **metrics):
+        history = HistoricalPerformances.objects.create(
+            fk_vendor_id=self.vendor_id,
+            on_time_delivery_rate=on_time_delivery_rate,
+            **metrics,
+        )
+        HistoricalPerformances.objects.filter(id=history.id).update(
+            created_at=created_at
+        )
+
+    def get_history(self, **params):
+        response = self.client.get(
+            self.url, params, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["data"]
+
+    def test_daily_buckets_keep_last_snapshot_and_carry_forward(self):
+        self.snapshot(self.start - timedelta(days=3), 10)
+        self.snapshot(self.start + timedelta(days=1, hours=2), 20)
+        self.snapshot(self.start + timedelta(days=1, hours=20), 30)
+        self.snapshot(self.start + timedelta(days=3, hours=5), 40)
+        data = self.get_history(
+            bucket="day",
+            start=self.start.isoformat(),
+            end=(self.start + timedelta(days=5)).isoformat(),
+        )
+        self.assertEqual(
+            [point["on_time_delivery_rate"] for point in data], [10, 30, 30, 40, 40]
+        )
+        self.assertEqual(
+            [point["carried_forward"] for point in data],
+            [True, False, True, False, True],
+        )
+        self.assertEqual(data[1]["bucket"], self.start + timedelta(days=1))
+
+    def test_each_metric_carries_its_last_known_value(self):
+        # partial rows, written one per metric before the snapshots were
+        # consolidated
+        self.snapshot(self.start - timedelta(days=2), 10)
+        self.snapshot(self.start - timedelta(days=1), quality_rating_avg=4)
+        self.snapshot(self.start + timedelta(days=1, hours=1), fulfillment_rate=80)
+        self.snapshot(self.start + timedelta(days=1, hours=2), 20)
+        self.snapshot(
+            self.start + timedelta(days=3, hours=1),
+            1,
+            quality_rating_avg=2,
+            average_response_time=3,
+            fulfillment_rate=4,
+        )
+        self.snapshot(self.start + timedelta(days=3, hours=2), quality_rating_avg=5)
+        data = self.get_history(
+            bucket="day",
+            start=self.start.isoformat(),
+            end=(self.start + timedelta(days=4)).isoformat(),
+        )
+        metrics = [
+            "on_time_delivery_rate",
+            "quality_rating_avg",
+            "average_response_time",
+            "fulfillment_rate",
+            "carried_forward",
+        ]
+        self.assertEqual(
+            [[point[metric] for metric in metrics] for point in data],
+            [
+                [10, 4, None, None, True],
+                [20, 4, None, 80, True],
+                [20, 4, None, 80, True],
+                [1, 5, 3, 4, False],
+            ],
+        )
+
+    def test_migration_marks_partial_rows(self):
+        migration = import_module("core.migrations.0010_history_partial_rows")
+        schema_editor = SimpleNamespace(connection=connection)
+        metrics = [
+            "on_time_delivery_rate",
+            "quality_rating_avg",
+            "average_response_time",
+            "fulfillment_rate",
+        ]
+        zeros = dict.fromkeys(metrics, 0)
+        legacy = [
+            {**zeros, "on_time_delivery_rate": 50},
+            {**zeros, "fulfillment_rate": 0},
+        ]
+        consolidated = [
+            {**zeros, "on_time_delivery_rate": 100, "quality_rating_avg": 4},
+            zeros,
+        ]
+        deployed_at = timezone.now()
+        for values in legacy:
+            HistoricalPerformances.objects.create(fk_vendor_id=self.vendor_id, **values)
+        HistoricalPerformances.objects.update(
+            created_at=deployed_at - timedelta(days=1)
+        )
+        for values in consolidated:
+            HistoricalPerformances.objects.create(fk_vendor_id=self.vendor_id, **values)
+        history = HistoricalPerformances.objects.order_by("id").values_list(*metrics)
+        unchanged = [tuple(values.values()) for values in legacy + consolidated]
+
+        with self.settings(
+            HISTORY_CONSOLIDATED_SINCE=(deployed_at - timedelta(days=2)).isoformat()
+        ):
+            migration.null_unwritten_metrics(django_apps, schema_editor)
+        self.assertEqual(list(history.all()), unchanged)
+
+        # unset, it is when 0007 was applied to the test database
+        migration.null_unwritten_metrics(django_apps, schema_editor)
+        self.assertEqual(
+            list(history.all()),
+            [
+                (50, None, None, None),
+                (None, None, None, None),
+                (100, 4, 0, 0),
+                (0, 0, 0, 0),
+            ],
+        )
+
+        migration.zero_unwritten_metrics(django_apps, schema_editor)
+        self.assertEqual(list(history.all()), unchanged)
+
+    def test_buckets_before_first_snapshot_are_skipped(self):
+        self.snapshot(self.start + timedelta(hours=2, minutes=30), 50)
+        data = self.get_history(
+            bucket="hour",
+            start=self.start.isoformat(),
+            end=(self.start + timedelta(hours=4)).isoformat(),
+        )
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]["bucket"], self.start + timedelta(hours=2))
+
+    def test_weekly_buckets_start_on_monday(self):
+        self.snapshot(self.start + timedelta(days=1), 60)
+        data = self.get_history(
+            bucket="week",
+            start=self.start.isoformat(),
+            end=(self.start + timedelta(days=14)).isoformat(),
+        )
+        # 2024-05-01 is a Wednesday
+        self.assertEqual(data[0]["bucket"], self.start - timedelta(days=2))
+        self.assertEqual(data[0]["on_time_delivery_rate"], 60)
+
+    def test_history_query_budget(self):
+        self.snapshot(self.start, 10)
+        # vendor lookup, bucketed snapshots and the last one before start
+        response = self.assertQueryBudget(
+            3, "get", self.url, {"start": self.start.isoformat()}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_history_rejects_bad_ranges(self):
+        for params in (
+            {"bucket": "month"},
+            {"start": "2024-05-02T00:00:00Z", "end": "2024-05-01T00:00:00Z"},
+            {"bucket": "hour", "start": "2020-01-01T00:00:00Z"},
+        ):
+            response = self.client.get(
+                self.url, params, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_history_of_missing_vendor(self):
+        url = reverse("v1:vendors_performance_history", kwargs={"vendor_id": 999})
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class VendorLeaderboardTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("v1:vendors_leaderboard")
+        self.vendor_b = Vendors.objects.create(
+            name="Vendor B",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="B123",
+        ).id
+        self.vendor_c = Vendors.objects.create(
+            name="Vendor C",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="C123",
+        ).id
+        # A: one on time, good rating. B: late, poor rating. C: no data
+        self.complete_rated(self.create_purchase_order(), 5)
+        po = self.create_purchase_order()
+        po.fk_vendor_id = self.vendor_b
+        po.delivery_date = timezone.now() - timedelta(days=1)
+        po.save()
+        self.complete_rated(po, 2)
+
+    def complete_rated(self, po, quality_rating):
+        po.quality_rating = quality_rating
+        po.save(update_fields=["quality_rating"])
+        self.complete(po)
+
+    def get_leaderboard(self, **params):
+        response = self.client.get(
+            self.url, params, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_ranks_and_percentiles(self):
+        data = self.get_leaderboard()["data"]
+        self.assertEqual(
+            [row["id"] for row in data], [self.vendor_id, self.vendor_b, self.vendor_c]
+        )
+        best, late, empty = data
+        self.assertEqual(best["composite_rank"], 1)
+        self.assertEqual(best["composite_percentile"], 100)
+        self.assertEqual(empty["composite_percentile"], 0)
+        self.assertEqual(best["on_time_delivery_rate_rank"], 1)
+        self.assertEqual(late["on_time_delivery_rate_rank"], 2)
+        self.assertEqual(late["quality_rating_avg"], 2)
+        # no data ranks last instead of looking like a perfect 0
+        self.assertEqual(empty["on_time_delivery_rate_rank"], 3)
+        self.assertEqual(empty["quality_rating_avg_rank"], 3)
+        self.assertEqual(empty["composite_score"], 0)
+
+    def test_no_data_ranks_last_when_lower_is_better(self):
+        po = self.create_purchase_order()
+        po.issue_date = timezone.now()
+        po.acknowledgment_date = po.issue_date + timedelta(hours=2)
+        po.save()
+        po = self.create_purchase_order()
+        po.fk_vendor_id = self.vendor_b
+        po.issue_date = timezone.now()
+        po.acknowledgment_date = po.issue_date + timedelta(hours=8)
+        po.save()
+
+        data = self.get_leaderboard(sort="average_response_time")["data"]
+        self.assertEqual(
+            [row["id"] for row in data], [self.vendor_id, self.vendor_b, self.vendor_c]
+        )
+        self.assertEqual(
+            [row["average_response_time_rank"] for row in data], [1, 2, 3]
+        )
+        self.assertEqual(
+            [row["average_response_time_percentile"] for row in data], [100, 50, 0]
+        )
+
+    def test_weights_and_sort(self):
+        data = self.get_leaderboard(
+            weights="quality_rating_avg:1", sort="quality_rating_avg"
+        )["data"]
+        self.assertEqual(data[0]["composite_score"], 100)
+        self.assertEqual(data[1]["composite_score"], 40)
+        self.assertEqual([row["quality_rating_avg_rank"] for row in data], [1, 2, 3])
+
+    def test_pagination(self):
+        response = self.get_leaderboard(limit=2)
+        self.assertEqual(response["count"], 3)
+        self.assertEqual(len(response["data"]), 2)
+        self.assertIsNotNone(response["next"])
+        data = self.get_leaderboard(limit=2, offset=2)["data"]
+        self.assertEqual([row["id"] for row in data], [self.vendor_c])
+
+    def test_cached_leaderboard_is_invalidated(self):
+        # the whole ranking in one query, then none
+        self.assertQueryBudget(1, "get", self.url)
+        self.assertQueryBudget(0, "get", self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Vendors.objects.filter(id=self.vendor_c).get().save()
+        self.assertQueryBudget(1, "get", self.url)
+
+    @override_settings(VENDOR_LEADERBOARD_CACHE_TIMEOUT=0)
+    def test_uncached_leaderboard_query_budget(self):
+        # count and the ranked page
+        response = self.assertQueryBudget(2, "get", self.url, {"limit": 1})
+        self.assertEqual(response.data["data"][0]["id"], self.vendor_id)
+
+    def test_leaderboard_rejects_bad_weights(self):
+        for weights in ("speed:1", "fulfillment_rate:x", "fulfillment_rate:0"):
+            response = self.client.get(
+                self.url,
+                {"weights": weights},
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BenchCommandTestCase(BaseTest):
+    def bench(self, **options):
+        stdout = StringIO()
+        call_command(
+            "bench",
+            vendors=3,
+            pos=30,
+            iterations=5,
+            page_size=10,
+            stdout=stdout,
+            **options,
+        )
+        return json.loads(stdout.getvalue())
+
+    def test_bench_reports_every_hot_path(self):
+        vendors = Vendors.objects.count()
+        results = self.bench()
+        self.assertEqual(
+            set(results),
+            {
+                "calculate_on_time_delivery_rate",
+                "calculate_quality_rating_avg",
+                "calculate_average_response_time",
+                "purchase_order_transition",
+                "recalculate_vendors_metrics",
+                "purchase_order_create",
+                "vendor_list",
+                "vendor_performance_list",
+                "purchase_order_list",
+                "vendor_detail",
+                "purchase_order_detail",
+            },
+        )
+        for result in results.values():
+            self.assertEqual(result["iterations"], 5)
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+        self.assertEqual(
+            results["calculate_on_time_delivery_rate"]["queries_per_op"], 0
+        )
+        # counters, vendor, metrics and history
+        self.assertEqual(results["purchase_order_transition"]["queries_per_op"], 4)
+        # select, update and history insert for all vendors together
+        self.assertEqual(
+            results["recalculate_vendors_metrics"]["queries_per_op"], 3
+        )
+        self.assertEqual(results["vendor_list"]["queries_per_op"], 1)
+        self.assertEqual(results["purchase_order_list"]["queries_per_op"], 1)
+        # the seeded rows are rolled back
+        self.assertEqual(Vendors.objects.count(), vendors)
+
+    def test_bench_fails_on_regression(self):
+        baseline = self.bench()
+        baseline["vendor_list"]["queries_per_op"] = 0
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as file:
+            json.dump(baseline, file)
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "vendor_list"):
+                self.bench(baseline=file.name)
+
+
+class ServerTimingTestCase(BaseTest):
+    def complete_over_http(self):
+        url = reverse("v1:po_status", kwargs={"po_id": self.po_id.id})
+        return self.client.post(
+            url,
+            {"status": PurchaseStatus.completed},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_reports_timings(self):
+        with self.assertLogs("core.timing", "INFO") as logs:
+            response = self.complete_over_http()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        metrics = {
+            metric.split(";")[0]: metric
+            for metric in response["Server-Timing"].split(", ")
+        }
+        self.assertEqual(set(metrics), {"db", "signals", "serializer", "total"})
+        self.assertRegex(metrics["db"], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["url_name"], "v1:po_status")
+        self.assertEqual(line["status"], 200)
+        self.assertGreater(line["db_queries"], 0)
+        self.assertGreaterEqual(line["total_ms"], line["signals_ms"])
+
+    def test_unsampled_request_has_no_header(self):
+        response = self.complete_over_http()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
+
+
+class MetricsEndpointTestCase(BaseTest):
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith("#"):
+                sample, value = line.rsplit(" ", 1)
+                samples[sample] = float(value)
+        return samples
+
+    def test_requests_and_recalculations_are_counted(self):
+        before = self.scrape()
+        url = reverse("v1:po_status", kwargs={"po_id": self.po_id.id})
+        self.client.post(
+            url,
+            {"status": PurchaseStatus.completed},
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.client.get(reverse("v1:vendors"))
+        after = self.scrape()
+
+        def delta(sample):
+            return after.get(sample, 0) - before.get(sample, 0)
+
+        self.assertEqual(
+            delta(
+                'http_requests_total{method="POST",status="200",url_name="v1:po_status"}'
+            ),
+            1,
+        )
+        self.assertEqual(
+            delta(
+                'http_requests_total{method="GET",status="401",url_name="v1:vendors"}'
+            ),
+            1,
+        )
+        self.assertEqual(
+            delta(
+                'http_request_duration_seconds_bucket{url_name="v1:po_status",le="+Inf"}'
+            ),
+            1,
+        )
+        self.assertGreater(delta('db_queries_total{url_name="v1:po_status"}'), 0)
+        self.assertEqual(
+            delta('vendor_metrics_recalculation_seconds_count{mode="single"}'), 1
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaRoutingTestCase(BaseTest):
+    def read_aliases(self, method, url, data=None):
+        """
+        Aliases the router picked for each read, the queries themselves
+        run on the test database
+        """
+        reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            reads.append((model, db_for_read(router, model, **hints)))
+            return "default"
+
+        with mock.patch.object(ReplicaRouter, "db_for_read", spy):
+            response = getattr(self.client, method)(
+                url, data, format="json", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return reads
+
+    def test_reads_of_get_handlers_go_to_replica(self):
+        reads = self.read_aliases("get", reverse("v1:po"))
+        self.assertIn((PurchaseOrder, "replica_1"), reads)
+        # authentication runs before the handler
+        self.assertNotIn((PurchaseOrder, "default"), reads)
+
+    def test_user_reads_own_writes_from_primary(self):
+        self.read_aliases(
+            "post",
+            reverse("v1:po_status", kwargs={"po_id": self.po_id.id}),
+            {"status": PurchaseStatus.completed},
+        )
+        reads = self.read_aliases("get", reverse("v1:po"))
+        self.assertIn((PurchaseOrder, "default"), reads)
+        self.assertNotIn((PurchaseOrder, "replica_1"), reads)
+
+    def test_cached_values_are_read_from_primary(self):
+        url = reverse("v1:vendors_performance", kwargs={"vendor_id": self.vendor_id})
+        reads = self.read_aliases("get", url)
+        # the ETag validators read the replica, the cached payload the primary
+        self.assertIn((Vendors, "replica_1"), reads)
+        self.assertIn((Vendors, "default"), reads)
+
+    def test_writes_and_migrations_stay_on_primary(self):
+        router = ReplicaRouter()
+        with use_replica():
+            self.assertEqual(router.db_for_write(Vendors), "default")
+            self.assertEqual(router.db_for_read(Vendors), "replica_1")
+        self.assertEqual(router.db_for_read(Vendors), "default")
+        self.assertFalse(router.allow_migrate("replica_1", "core"))
+        self.assertIsNone(router.allow_migrate("default", "core"))
+
+    @override_settings(DATABASE_REPLICAS=["replica_1", "replica_2"])
+    def test_reads_of_a_request_stay_on_one_replica(self):
+        router = ReplicaRouter()
+        picked = set()
+        for _ in range(20):
+            with use_replica():
+                reads = {router.db_for_read(Vendors) for _ in range(10)}
+            self.assertEqual(len(reads), 1)
+            picked |= reads
+        self.assertEqual(picked, {"replica_1", "replica_2"})
+
+    def test_pins_need_a_shared_cache(self):
+        errors = check_replica_pin_cache(None)
+        self.assertEqual([error.id for error in errors], ["core.E001"])
+        shared = {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "replica_pins",
+        }
+        with self.settings(
+            CACHES={**settings.CACHES, "pins": shared}, REPLICA_PIN_CACHE="pins"
+        ):
+            self.assertEqual(check_replica_pin_cache(None), [])
+        with self.settings(REPLICA_PIN_CACHE="missing"):
+            self.assertEqual(len(check_replica_pin_cache(None)), 1)
+
+
+class AsyncReadViewsTestCase(BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.headers = {"Authorization": f"Bearer {self.token}"}
+
+    async def get_both(self, url_name, **kwargs):
+        """
+        The responses of the sync view and of its async twin
+        """
+        sync = await sync_to_async(self.client.get)(
+            reverse(f"v1:{url_name}", kwargs=kwargs),
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        response = await self.async_client.get(
+            reverse(f"v1:async_{url_name}", kwargs=kwargs), headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sync, response
+
+    async def test_reads_match_sync_views(self):
+        for url_name, kwargs in (
+            ("vendors", {}),
+            ("vendors_detail", {"vendor_id": self.vendor_id}),
+            ("vendors_performance", {"vendor_id": self.vendor_id}),
+            ("vendors_performance_history", {"vendor_id": self.vendor_id}),
+            ("po", {}),
+            ("po_detail", {"po_id": self.po_id.id}),
+        ):
+            with self.subTest(url_name):
+                sync, response = await self.get_both(url_name, **kwargs)
+                self.assertEqual(response.json()["data"], sync.json()["data"])
+
+    async def test_list_pages_with_cursor(self):
+        for code in ("B1", "B2", "B3"):
+            await Vendors.objects.acreate(
+                name="Vendor B",
+                contact_details="Contact",
+                address="Address",
+                vendor_code=code,
+            )
+        url = reverse("v1:async_vendors") + "?limit=2"
+        seen = []
+        while url:
+            response = await self.async_client.get(url, headers=self.headers)
+            page = response.json()
+            seen += [vendor["id"] for vendor in page["data"]]
+            previous, url = page["previous"], page["next"]
+        expected = [vendor.id async for vendor in Vendors.objects.all()]
+        self.assertEqual(seen, expected)
+
+        response = await self.async_client.get(previous, headers=self.headers)
+        self.assertEqual(
+            [vendor["id"] for vendor in response.json()["data"]], expected[:2]
+        )
+
+    async def test_detail_answers_not_modified(self):
+        url = reverse("v1:async_vendors_detail", kwargs={"vendor_id": self.vendor_id})
+        response = await self.async_client.get(url, headers=self.headers)
+        response = await self.async_client.get(
+            url, headers={**self.headers, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_missing_objects(self):
+        for url_name, kwargs in (
+            ("async_vendors_detail", {"vendor_id": 0}),
+            ("async_vendors_performance_history", {"vendor_id": 0}),
+            ("async_po_detail", {"po_id": 0}),
+        ):
+            with self.subTest(url_name):
+                response = await self.async_client.get(
+                    reverse(f"v1:{url_name}", kwargs=kwargs), headers=self.headers
+                )
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_requires_valid_token(self):
+        url = reverse("v1:async_vendors")
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            response.json(),
+            {"message": "Authentication credentials were not provided."},
+        )
+        response = await self.async_client.get(
+            url, headers={"Authorization": "Bearer invalid"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BenchAsgiCommandTestCase(BaseTest):
+    def setUp(self):
+        super().setUp()
+        # the requests reach the application directly, like the test client
+        # keep them from closing the connection of the test transaction
+        for signal in (request_started, request_finished):
+            signal.disconnect(close_old_connections)
+            self.addCleanup(signal.connect, close_old_connections)
+
+    def test_bench_asgi_compares_sync_and_async(self):
+        vendors = Vendors.objects.count()
+        stdout = StringIO()
+        call_command(
+            "bench_asgi",
+            connections=2,
+            requests=4,
+            vendors=2,
+            pos=10,
+            endpoint=["vendor_list", "purchase_order_detail"],
+            stdout=stdout,
+        )
+        report = json.loads(stdout.getvalue())
+        for endpoint in ("vendor_list", "purchase_order_detail"):
+            for path in ("sync", "async"):
+                self.assertEqual(report[endpoint][path]["errors"], 0)
+                self.assertGreater(report[endpoint][path]["requests_per_second"], 0)
+        self.assertNotIn("vendor_detail", report)
+        self.assertEqual(Vendors.objects.count(), vendors)
+
+
+class AccountCacheTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.account = Account.objects.get(username=self.username)
+        self.url = reverse("v1:vendors")
+
+    def test_account_is_read_again_after_timeout(self):
+        with override_settings(ACCOUNT_CACHE_TIMEOUT=0):
+            account_cache.clear()
+            self.assertQueryBudget(2, "get", self.url)
+            self.assertQueryBudget(2, "get", self.url)
+        self.assertQueryBudget(2, "get", self.url)
+        self.assertQueryBudget(1, "get", self.url)
+
+    def test_deactivated_account_is_rejected_at_once(self):
+        self.assertQueryBudget(1, "get", self.url)
+        self.account.is_active = False
+        self.account.save()
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_least_recently_used_account_is_dropped(self):
+        others = [
+            Account.objects.create_user(username=f"user{i}", password="pass")
+            for i in range(2)
+        ]
+        with override_settings(ACCOUNT_CACHE_SIZE=2):
+            account_cache.set(self.account)
+            account_cache.set(others[0])
+            self.assertIsNotNone(account_cache.get(self.account.pk))
+            account_cache.set(others[1])
+        self.assertIsNone(account_cache.get(others[0].pk))
+        cached = account_cache.get(self.account.pk)
+        self.assertEqual(cached, self.account)
+        self.assertIsNot(cached, account_cache.get(self.account.pk))
+
+
+class SparseFieldsetTestCase(QueryBudgetMixin, BaseTest):
+    def get_sql(self, url, params, budget=1):
+        """
+        The response and the SQL of its last query, no deferred field may
+        be loaded afterwards
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.assertQueryBudget(budget, "get", url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries[-1]["sql"]
+
+    def test_fields_trim_representation_and_columns(self):
+        response, sql = self.get_sql(
+            reverse("v1:po"), {"fields": "id,po_number,status,fk_vendor.name"}
+        )
+        self.assertEqual(
+            response.data["data"][0],
+            {
+                "id": self.po_id.id,
+                "po_number": self.po_id.po_number,
+                "status": self.po_id.status,
+                "fk_vendor": {"name": "Vendor A"},
+            },
+        )
+        for column in ('"items"', '"delivery_date"', '"contact_details"'):
+            self.assertNotIn(column, sql)
+
+    def test_exclude_leaves_out_large_columns(self):
+        response, sql = self.get_sql(
+            reverse("v1:po_detail", kwargs={"po_id": self.po_id.id}),
+            {"exclude": "items,fk_vendor.contact_details,fk_vendor.address"},
+            budget=2,
+        )
+        data = response.data["data"]
+        self.assertNotIn("items", data)
+        self.assertEqual(
+            set(data["fk_vendor"]),
+            {"id", "name", "vendor_code", "created_at", "updated_at"},
+        )
+        self.assertIn('"delivery_date"', sql)
+        for column in ('"items"', '"contact_details"', '"address"'):
+            self.assertNotIn(column, sql)
+
+    def test_vendor_left_out_is_not_joined(self):
+        response, sql = self.get_sql(reverse("v1:po"), {"fields": "id,status"})
+        self.assertEqual(set(response.data["data"][0]), {"id", "status"})
+        self.assertNotIn("JOIN", sql)
+
+        response, sql = self.get_sql(
+            reverse("v1:vendors_detail", kwargs={"vendor_id": self.vendor_id}),
+            {"fields": "name"},
+            budget=2,
+        )
+        self.assertEqual(response.data["data"], {"name": "Vendor A"})
+        self.assertNotIn('"address"', sql)
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({"fields": "id,secret"}, {"exclude": "status.value"}):
+            with self.subTest(params):
+                response = self.client.get(
+                    reverse("v1:po"),
+                    params,
+                    HTTP_AUTHORIZATION=f"Bearer {self.token}",
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("Unknown field", response.data["message"])
+
+    async def test_async_views_take_the_same_fields(self):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        params = {"fields": "id,fk_vendor.vendor_code"}
+        response = await self.async_client.get(
+            reverse("v1:async_po"), params, headers=headers
+        )
+        self.assertEqual(
+            response.json()["data"],
+            [{"id": self.po_id.id, "fk_vendor": {"vendor_code": "A123"}}],
+        )
+        response = await self.async_client.get(
+            reverse("v1:async_po"), {"fields": "secret"}, headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PurchaseOrderFilterTestCase(QueryBudgetMixin, BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.other_vendor = Vendors.objects.create(
+            name="Vendor B",
+            contact_details="Contact",
+            address="Address",
+            vendor_code="B123",
+        )
+        self.overdue = self.create_purchase_order()
+        PurchaseOrder.objects.filter(id=self.overdue.id).update(
+            delivery_date=timezone.now() - timedelta(days=1)
+        )
+        self.completed = self.create_purchase_order()
+        self.complete(self.completed)
+        self.other = PurchaseOrder.objects.create(
+            po_number="PO-TEST-OTHER",
+            fk_vendor=self.other_vendor,
+            delivery_date=timezone.now() - timedelta(days=1),
+            items={"item1": "Item 1"},
+            quantity=1,
+        )
+
+    def get_ids(self, url, params, budget=1):
+        response = self.assertQueryBudget(budget, "get", url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [po["id"] for po in response.data["data"]]
+
+    def test_filters(self):
+        url = reverse("v1:po")
+        soon = (timezone.now() + timedelta(days=5)).isoformat()
+        for params, expected in (
+            ({}, [self.other, self.completed, self.overdue, self.po_id]),
+            ({"fk_vendor": self.other_vendor.id}, [self.other]),
+            ({"status": PurchaseStatus.completed}, [self.completed]),
+            (
+                {"fk_vendor": self.vendor_id, "overdue": "true"},
+                [self.overdue],
+            ),
+            (
+                {"overdue": "false"},
+                [self.completed, self.po_id],
+            ),
+            ({"delivery_date_before": soon}, [self.other, self.overdue]),
+            (
+                {"delivery_date_after": soon, "status": PurchaseStatus.pending},
+                [self.po_id],
+            ),
+            ({"completed_date_after": "2000-01-01T00:00:00Z"}, [self.completed]),
+            ({"order_date_before": "2000-01-01T00:00:00Z"}, []),
+        ):
+            with self.subTest(params):
+                self.assertEqual(self.get_ids(url, params), [po.id for po in expected])
+
+    def test_invalid_filters(self):
+        for params in (
+            {"status": "lost"},
+            {"fk_vendor": "a"},
+            {"delivery_date_after": "tomorrow"},
+            {
+                "order_date_after": "2030-01-01T00:00:00Z",
+                "order_date_before": "2020-01-01T00:00:00Z",
+            },
+        ):
+            with self.subTest(params):
+                response = self.assertQueryBudget(0, "get", reverse("v1:po"), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data["code"], status.HTTP_400_BAD_REQUEST)
+
+    def test_vendor_purchase_orders(self):
+        url = reverse("v1:vendors_po", kwargs={"vendor_id": self.vendor_id})
+        # the vendor of the url wins over the one of the query
+        params = {"fk_vendor": self.other_vendor.id, "overdue": "true"}
+        self.assertEqual(self.get_ids(url, params, budget=2), [self.overdue.id])
+        self.assertEqual(
+            self.get_ids(url, {"fields": "id"}, budget=2),
+            [self.completed.id, self.overdue.id, self.po_id.id],
+        )
+
+        response = self.client.get(
+            reverse("v1:vendors_po", kwargs={"vendor_id": 0}),
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["message"], "Vendor not found")
+
+        response = self.client.post(url, {}, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_filters_page_with_the_cursor(self):
+        params = {"fk_vendor": self.vendor_id, "limit": 1}
+        response = self.assertQueryBudget(1, "get", reverse("v1:po"), params)
+        self.assertEqual(
+            [po["id"] for po in response.data["data"]], [self.completed.id]
+        )
+        response = self.client.get(
+            response.data["next"], HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual([po["id"] for po in response.data["data"]], [self.overdue.id])
+
+    async def test_async_views_take_the_same_filters(self):
+        headers = {"Authorization": f"Bearer {self.token}"}
+        response = await self.async_client.get(
+            reverse("v1:async_po"), {"overdue": "true"}, headers=headers
+        )
+        self.assertEqual(
+            [po["id"] for po in response.json()["data"]],
+            [self.other.id, self.overdue.id],
+        )
+        response = await self.async_client.get(
+            reverse("v1:async_vendors_po", kwargs={"vendor_id": self.vendor_id}),
+            {"status": PurchaseStatus.completed},
+            headers=headers,
+        )
+        self.assertEqual(
+            [po["id"] for po in response.json()["data"]], [self.completed.id]
+        )
+        response = await self.async_client.get(
+            reverse("v1:async_po"), {"status": "lost"}, headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("status", response.json()["message"])
+        response = await self.async_client.get(
+            reverse("v1:async_vendors_po", kwargs={"vendor_id": 0}), headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {"message": "Vendor not found"})
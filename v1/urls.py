@@ -2,14 +2,33 @@ from unittest.mock import patch
 
 from django.urls import path
 
+from v1.async_views import (
+    AsyncPurchaseOrderDetailView,
+    AsyncPurchaseOrderView,
+    AsyncVendorDetailView,
+    AsyncVendorPerformanceHistoryView,
+    AsyncVendorPerformanceView,
+    AsyncVendorPurchaseOrderView,
+    AsyncVendorsView,
+)
 from v1.views import (
+    HistoricalPerformanceExportView,
+    PurchaseOrderBatchRatingView,
+    PurchaseOrderBatchStatusView,
+    PurchaseOrderBulkView,
     PurchaseOrderDetailView,
+    PurchaseOrderExportView,
     PurchaseOrderRatingView,
     PurchaseOrderStatusView,
     PurchaseOrderView,
     VendorAcknowledgePurchaseOrderView,
+    VendorBatchAcknowledgePurchaseOrderView,
     VendorDetailView,
+    VendorExportView,
+    VendorLeaderboardView,
+    VendorPerformanceHistoryView,
     VendorPerformanceView,
+    VendorPurchaseOrderView,
     VendorsView,
 )
 
@@ -18,12 +37,58 @@ app_name = "v1"
 urlpatterns = [
     path("vendors/", VendorsView.as_view(), name="vendors"),
     path("vendors/<int:vendor_id>", VendorDetailView.as_view(), name="vendors_detail"),
+    path(
+        "vendors/leaderboard",
+        VendorLeaderboardView.as_view(),
+        name="vendors_leaderboard",
+    ),
+    path(
+        "vendors/export/<str:export_format>",
+        VendorExportView.as_view(),
+        name="vendors_export",
+    ),
+    path(
+        "historical_performances/export/<str:export_format>",
+        HistoricalPerformanceExportView.as_view(),
+        name="history_export",
+    ),
     path(
         "vendors/<int:vendor_id>/performance",
         VendorPerformanceView.as_view(),
         name="vendors_performance",
     ),
+    path(
+        "vendors/<int:vendor_id>/performance/history",
+        VendorPerformanceHistoryView.as_view(),
+        name="vendors_performance_history",
+    ),
+    path(
+        "vendors/<int:vendor_id>/purchase_orders",
+        VendorPurchaseOrderView.as_view(),
+        name="vendors_po",
+    ),
     path("purchase_orders/", PurchaseOrderView.as_view(), name="po"),
+    path("purchase_orders/bulk", PurchaseOrderBulkView.as_view(), name="po_bulk"),
+    path(
+        "purchase_orders/export/<str:export_format>",
+        PurchaseOrderExportView.as_view(),
+        name="po_export",
+    ),
+    path(
+        "purchase_orders/status",
+        PurchaseOrderBatchStatusView.as_view(),
+        name="po_batch_status",
+    ),
+    path(
+        "purchase_orders/rating",
+        PurchaseOrderBatchRatingView.as_view(),
+        name="po_batch_rating",
+    ),
+    path(
+        "purchase_orders/acknowledge",
+        VendorBatchAcknowledgePurchaseOrderView.as_view(),
+        name="po_batch_acknowledge",
+    ),
     path(
         "purchase_orders/<int:po_id>",
         PurchaseOrderDetailView.as_view(),
@@ -44,4 +109,36 @@ urlpatterns = [
         VendorAcknowledgePurchaseOrderView.as_view(),
         name="po_acknowledge",
     ),
+    # the same reads served by async views, for ASGI deployments
+    path("async/vendors/", AsyncVendorsView.as_view(), name="async_vendors"),
+    path(
+        "async/vendors/<int:vendor_id>",
+        AsyncVendorDetailView.as_view(),
+        name="async_vendors_detail",
+    ),
+    path(
+        "async/vendors/<int:vendor_id>/performance",
+        AsyncVendorPerformanceView.as_view(),
+        name="async_vendors_performance",
+    ),
+    path(
+        "async/vendors/<int:vendor_id>/performance/history",
+        AsyncVendorPerformanceHistoryView.as_view(),
+        name="async_vendors_performance_history",
+    ),
+    path(
+        "async/vendors/<int:vendor_id>/purchase_orders",
+        AsyncVendorPurchaseOrderView.as_view(),
+        name="async_vendors_po",
+    ),
+    path(
+        "async/purchase_orders/",
+        AsyncPurchaseOrderView.as_view(),
+        name="async_po",
+    ),
+    path(
+        "async/purchase_orders/<int:po_id>",
+        AsyncPurchaseOrderDetailView.as_view(),
+        name="async_po_detail",
+    ),
 ]
@@ -1,16 +1,32 @@
 from datetime import timezone
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, status
 from rest_framework.response import Response
 
 from core.auth import isAuthenticated
-from core.models import PurchaseOrder, PurchaseStatus, Vendors
+from core.cache import get_vendor_performance
+from core.exports import EXPORT_CONTENT_TYPES, stream_export
+from core.fieldsets import SparseFieldset
+from core.filters import filter_purchase_orders
+from core.http import conditional_get
+from core.leaderboard import get_vendor_leaderboard
+from core.models import HistoricalPerformances, PurchaseOrder, PurchaseStatus, Vendors
+from core.pagination import RankPagination
+from core.routers import read_from_replica
+from core.sequences import po_number_allocator
+from core.utils import apply_purchase_order_transitions, get_performance_history
 from v1.serializers import (
     AcknowledgePurchaseOrderSerializer,
+    LeaderboardQuerySerializer,
+    PerformanceHistoryQuerySerializer,
     PurchaseOrderCreateSerializer,
+    PurchaseOrderFilterSerializer,
     PurchaseOrderListSerializer,
     PurchaseOrderUpdateSerializer,
     PurchaseQualityRatingSerializer,
@@ -21,24 +37,82 @@ from v1.serializers import (
     VendorUpdateSerializer,
 )
 
+FIELDSET_PARAMETERS = [
+    openapi.Parameter(
+        name,
+        openapi.IN_QUERY,
+        description=f"comma separated fields to {verb}, fk_vendor.name for "
+        "the fields of the vendor",
+        type=openapi.TYPE_STRING,
+    )
+    for name, verb in (("fields", "return"), ("exclude", "leave out"))
+]
+
+
+def _get_version(*parts):
+    return "-".join(
+        str(part.timestamp()) if hasattr(part, "timestamp") else str(part)
+        for part in parts
+    )
+
+
+def get_vendor_validators(vendor_id, **kwargs):
+    updated_at = (
+        Vendors.objects.filter(id=vendor_id).values_list("updated_at", flat=True)
+    ).first()
+    if updated_at is None:
+        return None
+    return _get_version("vendor", vendor_id, updated_at), updated_at
+
+
+def get_purchase_order_validators(po_id, **kwargs):
+    # the detail embeds the vendor, its changes are part of the version
+    row = (
+        PurchaseOrder.objects.filter(id=po_id).values_list(
+            "updated_at", "fk_vendor__updated_at"
+        )
+    ).first()
+    if row is None or None in row:
+        return None
+    return _get_version("po", po_id, *row), max(row)
+
+
+def get_vendor_performance_validators(vendor_id, **kwargs):
+    # every metric recalculation writes a history row, the latest one
+    # identifies the current metrics
+    latest_history = HistoricalPerformances.objects.filter(
+        fk_vendor=OuterRef("id")
+    ).order_by("-id")
+    row = (
+        Vendors.objects.filter(id=vendor_id)
+        .annotate(
+            metrics_version=Subquery(latest_history.values("id")[:1]),
+            metrics_updated_at=Subquery(latest_history.values("created_at")[:1]),
+        )
+        .values_list("updated_at", "metrics_version", "metrics_updated_at")
+    ).first()
+    if row is None or row[0] is None:
+        return None
+    updated_at, metrics_version, metrics_updated_at = row
+    return (
+        _get_version("performance", vendor_id, updated_at, metrics_version),
+        max(updated_at, metrics_updated_at or updated_at),
+    )
+
 
 class VendorsView(generics.ListAPIView):
     queryset = Vendors.objects.all()
     serializer_class = VendorCreateSerializer
     permission_classes = [isAuthenticated]
 
-    @swagger_auto_schema(tags=["Vendors"])
+    @swagger_auto_schema(tags=["Vendors"], manual_parameters=FIELDSET_PARAMETERS)
+    @read_from_replica
     def get(self, request):
+        fieldset = SparseFieldset(VendorListSerializer, request.query_params)
         try:
-            data = self.get_queryset()
-            serializer = VendorListSerializer(data, many=True)
-            return Response(
-                {
-                    "data": serializer.data,
-                    "message": "success",
-                },
-                status=status.HTTP_200_OK,
-            )
+            page = self.paginate_queryset(fieldset.get_queryset(self.get_queryset()))
+            serializer = fieldset.trim(VendorListSerializer(page, many=True))
+            return self.get_paginated_response(serializer.data)
         except Exception as e:
             return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -64,19 +138,23 @@ class VendorDetailView(generics.ListAPIView):
     serializer_class = VendorUpdateSerializer
     permission_classes = [isAuthenticated]
 
-    def get_object(self):
+    def get_object(self, queryset=None):
+        queryset = self.queryset if queryset is None else queryset
         try:
-            return self.queryset.get(pk=self.kwargs["vendor_id"])
+            return queryset.get(pk=self.kwargs["vendor_id"])
         except Vendors.DoesNotExist:
             return Response(
                 {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-    @swagger_auto_schema(tags=["Vendors"])
+    @swagger_auto_schema(tags=["Vendors"], manual_parameters=FIELDSET_PARAMETERS)
+    @read_from_replica
+    @conditional_get(get_vendor_validators)
     def get(self, request, *args, **kwargs):
-        data = self.get_object()
+        fieldset = SparseFieldset(VendorListSerializer, request.query_params)
+        data = self.get_object(fieldset.get_queryset(self.queryset))
         try:
-            serializer = VendorListSerializer(data, many=False)
+            serializer = fieldset.trim(VendorListSerializer(data, many=False))
             return Response(
                 {"data": serializer.data, "message": "success"},
                 status=status.HTTP_200_OK,
@@ -120,25 +198,41 @@ class VendorDetailView(generics.ListAPIView):
 
 
 class PurchaseOrderView(generics.ListAPIView):
-    queryset = PurchaseOrder.objects.all()
+    queryset = PurchaseOrder.objects.select_related("fk_vendor")
     serializer_class = PurchaseOrderCreateSerializer
     permission_classes = [isAuthenticated]
 
-    @swagger_auto_schema(tags=["Purchase Orders"])
-    def get(self, request):
+    def list(self, request, **filters):
+        """
+        Page of the purchase orders matching the query filters, `filters`
+        take precedence over them
+        """
+        fieldset = SparseFieldset(PurchaseOrderListSerializer, request.query_params)
         try:
-            data = self.get_queryset()
-            serializer = PurchaseOrderListSerializer(data, many=True)
-            return Response(
-                {
-                    "data": serializer.data,
-                    "message": "success",
-                },
-                status=status.HTTP_200_OK,
+            query = PurchaseOrderFilterSerializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"message": query.errors, "code": status.HTTP_400_BAD_REQUEST},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            queryset = filter_purchase_orders(
+                self.get_queryset(), **{**query.validated_data, **filters}
             )
+            page = self.paginate_queryset(fieldset.get_queryset(queryset))
+            serializer = fieldset.trim(PurchaseOrderListSerializer(page, many=True))
+            return self.get_paginated_response(serializer.data)
         except Exception as e:
             return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(
+        tags=["Purchase Orders"],
+        query_serializer=PurchaseOrderFilterSerializer,
+        manual_parameters=FIELDSET_PARAMETERS,
+    )
+    @read_from_replica
+    def get(self, request):
+        return self.list(request)
+
     @swagger_auto_schema(tags=["Purchase Orders"])
     def post(self, request, *args, **kwargs):
         try:
@@ -157,25 +251,120 @@ class PurchaseOrderView(generics.ListAPIView):
             )
 
 
+class VendorPurchaseOrderView(PurchaseOrderView):
+    """
+    Purchase orders of a vendor, with the filters of the purchase order list
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    @swagger_auto_schema(
+        tags=["Vendors"],
+        query_serializer=PurchaseOrderFilterSerializer,
+        manual_parameters=FIELDSET_PARAMETERS,
+    )
+    @read_from_replica
+    def get(self, request, *args, **kwargs):
+        vendor_id = kwargs["vendor_id"]
+        if not Vendors.objects.filter(id=vendor_id).exists():
+            return Response(
+                {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return self.list(request, fk_vendor=vendor_id)
+
+
+class PurchaseOrderBulkView(generics.CreateAPIView):
+    serializer_class = PurchaseOrderCreateSerializer
+    permission_classes = [isAuthenticated]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["vendors"] = getattr(self, "vendors", None)
+        return context
+
+    def get_vendors(self, items):
+        vendor_ids = {
+            int(item["fk_vendor"])
+            for item in items
+            if isinstance(item, dict) and str(item.get("fk_vendor")).isdigit()
+        }
+        return Vendors.objects.in_bulk(vendor_ids)
+
+    @swagger_auto_schema(
+        tags=["Purchase Orders"],
+        request_body=PurchaseOrderCreateSerializer(many=True),
+    )
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"message": "Expected a list of purchase orders"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.PO_BULK_MAX_SIZE:
+            return Response(
+                {
+                    "message": f"Can't create more than {settings.PO_BULK_MAX_SIZE} "
+                    "purchase orders at once"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        self.vendors = self.get_vendors(items)
+        orders, indexes, errors = [], [], []
+        for index, item in enumerate(items):
+            serializer = self.get_serializer(data=item)
+            if serializer.is_valid():
+                orders.append(PurchaseOrder(**serializer.validated_data))
+                indexes.append(index)
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+
+        if orders:
+            with transaction.atomic():
+                po_numbers = po_number_allocator.allocate(len(orders))
+                for order, po_number in zip(orders, po_numbers):
+                    order.po_number = po_number
+                PurchaseOrder.objects.bulk_create(orders)
+
+        return Response(
+            {
+                "data": [
+                    {"index": index, "id": order.id, "po_number": order.po_number}
+                    for index, order in zip(indexes, orders)
+                ],
+                "errors": errors,
+                "message": "purchase orders created",
+            },
+            status=status.HTTP_201_CREATED if orders else status.HTTP_400_BAD_REQUEST,
+        )
+
+
 class PurchaseOrderDetailView(generics.ListAPIView):
-    queryset = PurchaseOrder.objects.all()
+    queryset = PurchaseOrder.objects.select_related("fk_vendor")
     serializer_class = PurchaseOrderUpdateSerializer
     permission_classes = [isAuthenticated]
 
-    def get_object(self):
+    def get_object(self, queryset=None):
+        queryset = self.queryset if queryset is None else queryset
         try:
-            return self.queryset.get(pk=self.kwargs["po_id"])
+            return queryset.get(pk=self.kwargs["po_id"])
         except Vendors.DoesNotExist:
             return Response(
                 {"message": "Purchase order not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-    @swagger_auto_schema(tags=["Purchase Orders"])
+    @swagger_auto_schema(
+        tags=["Purchase Orders"], manual_parameters=FIELDSET_PARAMETERS
+    )
+    @read_from_replica
+    @conditional_get(get_purchase_order_validators)
     def get(self, request, *args, **kwargs):
-        data = self.get_object()
+        fieldset = SparseFieldset(PurchaseOrderListSerializer, request.query_params)
+        data = self.get_object(fieldset.get_queryset(self.queryset))
         try:
-            serializer = PurchaseOrderListSerializer(data, many=False)
+            serializer = fieldset.trim(PurchaseOrderListSerializer(data, many=False))
             return Response(
                 {"data": serializer.data, "message": "success"},
                 status=status.HTTP_200_OK,
@@ -188,11 +377,14 @@ class PurchaseOrderDetailView(generics.ListAPIView):
 
     @swagger_auto_schema(tags=["Purchase Orders"])
     def put(self, request, *args, **kwargs):
-        instance = self.get_object()
         try:
-            serializer = self.get_serializer(instance, data=request.data)
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                instance = self.get_object(
+                    self.queryset.select_for_update(of=("self",))
+                )
+                serializer = self.get_serializer(instance, data=request.data)
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
             return Response(
                 {"data": serializer.data, "message": "purchase order updated"},
                 status=status.HTTP_200_OK,
@@ -205,9 +397,12 @@ class PurchaseOrderDetailView(generics.ListAPIView):
 
     @swagger_auto_schema(tags=["Purchase Orders"])
     def delete(self, request, *args, **kwargs):
-        instance = self.get_object()
         try:
-            instance.delete()
+            with transaction.atomic():
+                instance = self.get_object(
+                    self.queryset.select_for_update(of=("self",))
+                )
+                instance.delete()
             return Response(
                 {"message": "purchase order deleted"}, status=status.HTTP_204_NO_CONTENT
             )
@@ -223,13 +418,19 @@ class VendorPerformanceView(generics.ListAPIView):
     serializer_class = VendorPerformanceSerializer
     permission_classes = [isAuthenticated]
 
+    def get_performance(self):
+        data = Vendors.objects.get(id=self.kwargs["vendor_id"])
+        serializer = self.get_serializer(data, many=False)
+        return dict(serializer.data)
+
     @swagger_auto_schema(tags=["Vendors"])
+    @read_from_replica
+    @conditional_get(get_vendor_performance_validators)
     def get(self, request, *args, **kwargs):
         try:
-            data = Vendors.objects.get(id=kwargs["vendor_id"])
-            serializer = self.get_serializer(data, many=False)
+            data = get_vendor_performance(kwargs["vendor_id"], self.get_performance)
             return Response(
-                {"data": serializer.data, "message": "success"},
+                {"data": data, "message": "success"},
                 status=status.HTTP_200_OK,
             )
         except Vendors.DoesNotExist:
@@ -243,6 +444,81 @@ class VendorPerformanceView(generics.ListAPIView):
             )
 
 
+class VendorPerformanceHistoryView(generics.GenericAPIView):
+    """
+    Vendor metrics bucketed by hour, day or week over a time range
+    """
+
+    serializer_class = PerformanceHistoryQuerySerializer
+    permission_classes = [isAuthenticated]
+
+    @swagger_auto_schema(tags=["Vendors"], query_serializer=serializer_class)
+    @read_from_replica
+    def get(self, request, *args, **kwargs):
+        try:
+            query = self.get_serializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"message": query.errors, "code": status.HTTP_400_BAD_REQUEST},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            vendor_id = kwargs["vendor_id"]
+            if not Vendors.objects.filter(id=vendor_id).exists():
+                return Response(
+                    {"message": "Vendor not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+            data = get_performance_history(vendor_id, **query.validated_data)
+            return Response(
+                {"data": data, "message": "success"},
+                status=status.HTTP_200_OK,
+            )
+        except Exception as e:
+            return Response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class VendorLeaderboardView(generics.GenericAPIView):
+    """
+    Every vendor ranked by each KPI and by a weighted composite score
+    """
+
+    serializer_class = LeaderboardQuerySerializer
+    pagination_class = RankPagination
+    permission_classes = [isAuthenticated]
+
+    @swagger_auto_schema(tags=["Vendors"], query_serializer=serializer_class)
+    @read_from_replica
+    def get(self, request, *args, **kwargs):
+        try:
+            query = self.get_serializer(data=request.query_params)
+            if not query.is_valid():
+                return Response(
+                    {"message": query.errors, "code": status.HTTP_400_BAD_REQUEST},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            leaderboard = get_vendor_leaderboard(**query.validated_data)
+            page = self.paginate_queryset(leaderboard)
+            return self.get_paginated_response(page)
+        except Exception as e:
+            return Response(
+                {"message": str(e), "code": status.HTTP_400_BAD_REQUEST},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+def get_locked_purchase_order(po_id, select_vendor=True):
+    """
+    The purchase order, locked until the transaction ends so a concurrent
+    change of it waits instead of applying its metric delta twice
+    """
+    queryset = PurchaseOrder.objects.select_for_update(of=("self",))
+    if select_vendor:
+        queryset = queryset.select_related("fk_vendor")
+    return queryset.get(id=po_id)
+
+
 class PurchaseOrderStatusView(generics.CreateAPIView):
     serializer_class = PurchaseStatusSerializer
     permission_classes = [isAuthenticated]
@@ -251,13 +527,14 @@ class PurchaseOrderStatusView(generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         try:
             _status = request.data.get("status")
-            po = PurchaseOrder.objects.get(id=kwargs["po_id"])
-            po.status = _status
+            with transaction.atomic():
+                po = get_locked_purchase_order(kwargs["po_id"])
+                po.status = _status
 
-            if _status == PurchaseStatus.completed:
-                po.completed_date = timezone.now()
+                if _status == PurchaseStatus.completed:
+                    po.completed_date = timezone.now()
 
-            po.save(update_fields=["status", "completed_date"])
+                po.save(update_fields=["status", "completed_date", "updated_at"])
 
             serializer = PurchaseOrderListSerializer(po, many=False)
             return Response(
@@ -279,16 +556,17 @@ class PurchaseOrderRatingView(generics.CreateAPIView):
     def post(self, request, *args, **kwargs):
         try:
             _quality_rating = request.data.get("quality_rating")
-            po = PurchaseOrder.objects.get(id=kwargs["po_id"])
+            with transaction.atomic():
+                po = get_locked_purchase_order(kwargs["po_id"])
 
-            if po.status != PurchaseStatus.completed:
-                return Response(
-                    {"message": "Can't give rating for uncompleted order"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            po.quality_rating = _quality_rating
+                if po.status != PurchaseStatus.completed:
+                    return Response(
+                        {"message": "Can't give rating for uncompleted order"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                po.quality_rating = _quality_rating
 
-            po.save(update_fields=["quality_rating"])
+                po.save(update_fields=["quality_rating", "updated_at"])
 
             serializer = PurchaseOrderListSerializer(po, many=False)
             return Response(
@@ -314,14 +592,15 @@ class VendorAcknowledgePurchaseOrderView(generics.CreateAPIView):
         try:
             _acknowledgment_date = request.data.get("acknowledgment_date")
 
-            po = PurchaseOrder.objects.get(id=kwargs["po_id"])
-            if po.issue_date == None:
-                return Response(
-                    {"message": "PO not issued to the vendor yet"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            po.acknowledgment_date = _acknowledgment_date
-            po.save(update_fields=["acknowledgment_date"])
+            with transaction.atomic():
+                po = get_locked_purchase_order(kwargs["po_id"], select_vendor=False)
+                if po.issue_date == None:
+                    return Response(
+                        {"message": "PO not issued to the vendor yet"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                po.acknowledgment_date = _acknowledgment_date
+                po.save(update_fields=["acknowledgment_date", "updated_at"])
 
             return Response(
                 {"message": "Acknowledgment updated successfully"},
@@ -332,3 +611,235 @@ class VendorAcknowledgePurchaseOrderView(generics.CreateAPIView):
                 {"message": "Purchase order not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
+
+
+class PurchaseOrderBatchUpdateView(generics.CreateAPIView):
+    """
+    Applies a lifecycle change to a list of purchase orders, given as
+    [{"id": ..., <field>: ...}], with one set-based UPDATE and one metric
+    recalculation per affected vendor
+    """
+
+    permission_classes = [isAuthenticated]
+    message = "Purchase orders updated successfully"
+
+    def get_changes(self, state, validated_data):
+        """
+        Fields to write for one purchase order, or an error message
+        """
+        return validated_data
+
+    @staticmethod
+    def get_item_id(item):
+        """
+        Purchase order id of a batch item, None unless it is an integer
+        """
+        po_id = item.get("id") if isinstance(item, dict) else None
+        if isinstance(po_id, bool) or not isinstance(po_id, int):
+            return None
+        return po_id
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"message": "Expected a list of purchase orders"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.PO_BULK_MAX_SIZE:
+            return Response(
+                {
+                    "message": f"Can't update more than {settings.PO_BULK_MAX_SIZE} "
+                    "purchase orders at once"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ids = {self.get_item_id(item) for item in items} - {None}
+        updated, errors = [], []
+        with transaction.atomic():
+            states = {
+                state.pop("id"): state
+                for state in PurchaseOrder.objects.select_for_update()
+                .filter(id__in=ids)
+                .values("id", *PurchaseOrder.METRIC_FIELDS)
+            }
+            changes, transitions = {}, []
+            for index, item in enumerate(items):
+                po_id = self.get_item_id(item)
+                if po_id not in states:
+                    errors.append(
+                        {"index": index, "errors": "Purchase order not found"}
+                    )
+                    continue
+                serializer = self.get_serializer(data=item)
+                if not serializer.is_valid():
+                    errors.append({"index": index, "errors": serializer.errors})
+                    continue
+                change = self.get_changes(states[po_id], serializer.validated_data)
+                if isinstance(change, str):
+                    errors.append({"index": index, "errors": change})
+                    continue
+
+                new_state = {**states[po_id], **change}
+                transitions.append((states[po_id], new_state))
+                states[po_id] = new_state
+                changes.setdefault(po_id, {}).update(change)
+                updated.append({"index": index, "id": po_id})
+
+            if changes:
+                now = timezone.now()
+                fields = {field for change in changes.values() for field in change}
+                PurchaseOrder.objects.bulk_update(
+                    [
+                        PurchaseOrder(
+                            id=po_id,
+                            updated_at=now,
+                            **{field: states[po_id][field] for field in fields},
+                        )
+                        for po_id in changes
+                    ],
+                    [*fields, "updated_at"],
+                )
+                apply_purchase_order_transitions(transitions)
+
+        return Response(
+            {"data": updated, "errors": errors, "message": self.message},
+            status=status.HTTP_200_OK if updated else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class PurchaseOrderBatchStatusView(PurchaseOrderBatchUpdateView):
+    serializer_class = PurchaseStatusSerializer
+    message = "Status updated successfully"
+
+    def get_changes(self, state, validated_data):
+        changes = {"status": validated_data["status"]}
+        if changes["status"] == PurchaseStatus.completed:
+            changes["completed_date"] = timezone.now()
+        return changes
+
+    @swagger_auto_schema(
+        tags=["Purchase Orders"], request_body=PurchaseStatusSerializer(many=True)
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class PurchaseOrderBatchRatingView(PurchaseOrderBatchUpdateView):
+    serializer_class = PurchaseQualityRatingSerializer
+    message = "Quality rating updated successfully"
+
+    def get_changes(self, state, validated_data):
+        if state["status"] != PurchaseStatus.completed:
+            return "Can't give rating for uncompleted order"
+        return {"quality_rating": validated_data.get("quality_rating")}
+
+    @swagger_auto_schema(
+        tags=["Purchase Orders"],
+        request_body=PurchaseQualityRatingSerializer(many=True),
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class VendorBatchAcknowledgePurchaseOrderView(PurchaseOrderBatchUpdateView):
+    serializer_class = AcknowledgePurchaseOrderSerializer
+    message = "Acknowledgment updated successfully"
+
+    def get_changes(self, state, validated_data):
+        if state["issue_date"] is None:
+            return "PO not issued to the vendor yet"
+        return {"acknowledgment_date": validated_data.get("acknowledgment_date")}
+
+    @swagger_auto_schema(
+        tags=["Purchase Orders"],
+        request_body=AcknowledgePurchaseOrderSerializer(many=True),
+    )
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+
+class ExportView(generics.GenericAPIView):
+    """
+    Streams every row of the model as NDJSON or CSV
+    """
+
+    permission_classes = [isAuthenticated]
+    fields = []
+    filename = None
+
+    def get(self, request, export_format, *args, **kwargs):
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {"message": "Export format must be ndjson or csv"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = self.get_queryset().order_by("id")
+        return stream_export(queryset, self.fields, export_format, self.filename)
+
+
+class PurchaseOrderExportView(ExportView):
+    queryset = PurchaseOrder.objects.all()
+    filename = "purchase_orders"
+    fields = [
+        "id",
+        "po_number",
+        "fk_vendor",
+        "order_date",
+        "delivery_date",
+        "items",
+        "quantity",
+        "status",
+        "issue_order",
+        "quality_rating",
+        "issue_date",
+        "acknowledgment_date",
+        "completed_date",
+        "created_at",
+        "updated_at",
+    ]
+
+    @swagger_auto_schema(tags=["Purchase Orders"], responses={200: "NDJSON or CSV"})
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class VendorExportView(ExportView):
+    queryset = Vendors.objects.all()
+    filename = "vendors"
+    fields = [
+        "id",
+        "name",
+        "contact_details",
+        "address",
+        "vendor_code",
+        "on_time_delivery_rate",
+        "quality_rating_avg",
+        "average_response_time",
+        "fulfillment_rate",
+        "created_at",
+        "updated_at",
+    ]
+
+    @swagger_auto_schema(tags=["Vendors"], responses={200: "NDJSON or CSV"})
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class HistoricalPerformanceExportView(ExportView):
+    queryset = HistoricalPerformances.objects.all()
+    filename = "historical_performances"
+    fields = [
+        "id",
+        "fk_vendor",
+        "on_time_delivery_rate",
+        "quality_rating_avg",
+        "average_response_time",
+        "fulfillment_rate",
+        "created_at",
+    ]
+
+    @swagger_auto_schema(tags=["Vendors"], responses={200: "NDJSON or CSV"})
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
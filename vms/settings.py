@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -56,6 +57,9 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",
+    "core.timing.ServerTimingMiddleware",
+    "core.routers.ReplicaPinMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -106,10 +110,139 @@ DATABASES = {
     }
 }
 
+# Copies of db.sqlite3 that GET handlers read from, comma separated paths
+# in VMS_DATABASE_REPLICAS, refreshed by manage.py sync_replicas
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get("VMS_DATABASE_REPLICAS", "").split(",")), 1
+):
+    DATABASES[f"replica_{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# Seconds a user's reads stay on the primary after a write, so they read
+# their own writes while the replicas are behind
+REPLICA_PIN_SECONDS = 5
+
+# Cache alias the pins are kept in. With replicas it has to be shared by
+# every process (database, memcached, redis), the checks reject one local
+# to a process such as LocMemCache
+REPLICA_PIN_CACHE = "default"
+
+# PRAGMAs run on every new SQLite connection, see core.db
+SQLITE_PRAGMAS = {}
+
+# VMS_DATABASE_PROFILE=production keeps connections open between requests
+# and lets SQLite readers and a writer work concurrently
+DATABASE_PROFILE = os.environ.get("VMS_DATABASE_PROFILE", "development")
+
+if DATABASE_PROFILE == "production":
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = 600
+        database["CONN_HEALTH_CHECKS"] = True
+    SQLITE_PRAGMAS = {
+        # readers don't block the writer and the other way round
+        "journal_mode": "WAL",
+        # in WAL mode only a power loss can lose the last commits
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # negative is in KiB: 64MB of page cache per connection
+        "cache_size": -64 * 1024,
+        # milliseconds to wait for the write lock instead of failing
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    }
+
+# Every process has its own LocMemCache, deployments with several processes
+# need a shared backend (database, memcached, redis) for invalidation to
+# reach all of them
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        # the cached vendor performance and leaderboards, culled past it
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # one entry per vendor, above the vendor count nothing is culled
+    "generations": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "generations",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+}
+
+# Cache alias of the generations the cached vendor performance and
+# leaderboards are keyed by. Kept apart from the payloads so their culling
+# doesn't drop a generation, which would throw away the cache of its vendor.
+GENERATION_CACHE = "generations"
+
+# Seconds a vendor performance payload is cached, bounds how stale it can
+# get if an invalidation is missed
+VENDOR_PERFORMANCE_CACHE_TIMEOUT = 60
+
+# Recalculate vendor metrics in the run_metrics_worker command instead of
+# inside the request that changed the purchase order
+VENDOR_METRICS_OUTBOX = False
+
+# Purchase order numbers each process reserves at once, above 1 numbers are
+# no longer in creation order across processes and may have gaps
+PO_NUMBER_BLOCK_SIZE = 1
+
+# Largest list accepted by the purchase order bulk create endpoint
+PO_BULK_MAX_SIZE = 1000
+
+# ISO datetime of the deploy that started writing one history row with all
+# four metrics, migration 0010 nulls the unwritten zeros of the rows created
+# before it. Unset, it is when migration core 0007 was applied.
+HISTORY_CONSOLIDATED_SINCE = os.environ.get("VMS_HISTORY_CONSOLIDATED_SINCE")
+
+# Most buckets returned by the vendor performance history endpoint
+PERFORMANCE_HISTORY_MAX_BUCKETS = 2000
+
+# Default weights of the vendor leaderboard composite score, they don't
+# have to add up to 1
+VENDOR_LEADERBOARD_WEIGHTS = {
+    "on_time_delivery_rate": 0.35,
+    "quality_rating_avg": 0.35,
+    "average_response_time": 0.1,
+    "fulfillment_rate": 0.2,
+}
+
+# Average response time, in hours, that scores half of the response time
+# weight in the leaderboard composite score
+VENDOR_LEADERBOARD_RESPONSE_HOURS = 24
+
+# Seconds a whole leaderboard ranking is cached, 0 ranks on every request
+VENDOR_LEADERBOARD_CACHE_TIMEOUT = 60
+
+# Directory where each worker process keeps its /metrics counters, so any
+# worker can report the sum over all of them. None keeps the counters in
+# memory, per process. Empty it when the workers restart.
+METRICS_DIR = None
+
+# Share of the requests, 0 to 1, that get a Server-Timing header and a
+# timing log line
+SERVER_TIMING_SAMPLE_RATE = 0
+
+# Seconds an authenticated account is kept in the memory of a process, and
+# how many of them. Bounds how long other processes still accept a token
+# of an account deactivated or changed elsewhere, 0 disables the cache.
+ACCOUNT_CACHE_TIMEOUT = 30
+ACCOUNT_CACHE_SIZE = 1024
+
+# Threads the async sign-in hashes passwords in, and how many sign-ins may
+# be hashing or waiting for a thread before the next ones get a 503
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_MAX_PENDING = 64
+
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("core.auth.CachedJWTAuthentication",),
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 100,
 }
 
 SIMPLE_JWT = {
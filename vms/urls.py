@@ -3,6 +3,8 @@ from django.urls import include, path, re_path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
+from core.metrics import metrics_view
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Vendor Management System API",
@@ -16,6 +18,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("v1/api/", include("v1.urls")),
     path("v1/auth/api/", include("authentication.urls")),
+    path("metrics", metrics_view, name="metrics"),
     re_path(
         r"^docs(?P<format>\.json|\.yaml)$",
         schema_view.without_ui(cache_timeout=0),